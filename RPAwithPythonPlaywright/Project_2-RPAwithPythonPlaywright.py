@@ -1,29 +1,51 @@
+import time
+# Process start, for measuring time to first useful work
+PROCESS_START = time.perf_counter()
+
 import re
 import os
-import gspread
+import sys
+import json
+import argparse
 import logging
-from oauth2client.service_account import ServiceAccountCredentials
-from playwright.sync_api import Playwright, sync_playwright, expect, TimeoutError, Page
-from dotenv import load_dotenv, find_dotenv
-from bs4 import BeautifulSoup
-import time
-
-# Configure logging
-logging.basicConfig(filename='mapping_log.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# locate .env
-dotenv_path = find_dotenv()
-if not dotenv_path:
-    raise FileNotFoundError(".env file not found.")
-load_dotenv(dotenv_path)
-
-# Google Sheets setup
-scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/drive']
-creds = ServiceAccountCredentials.from_json_keyfile_name('GoogleCloudCredentials.json', scope)
-client = gspread.authorize(creds)
-
-# Get the Google Sheet ### Update for new runs
-sheet = client.open("Consistent_Google_Sheet_Source").worksheet("Source")
+import logging.handlers
+import statistics
+import socket
+import contextlib
+import difflib
+import threading
+import multiprocessing
+import urllib.request
+import urllib.parse
+import html
+import html.parser
+import collections
+from collections import namedtuple
+from typing import TYPE_CHECKING
+
+# Logging, the quota-aware Google Sheets client and the work queue are shared with the webscraper script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import automation_common.work_queue
+from automation_common.logs import LOG_SAMPLED, payload_logger, setup_logging
+from automation_common.sheets import SheetsClient
+
+# Playwright, gspread and dotenv are imported where they are first needed, so --help and dry runs start fast
+if TYPE_CHECKING:
+    from playwright.sync_api import Playwright, Page
+
+first_work_logged = False
+
+def log_time_to_first_work(step):
+    # Logged once per process, from interpreter start to the first step doing real work
+    global first_work_logged
+    if not first_work_logged:
+        first_work_logged = True
+        logging.info(f"Time to first useful work ({step}): {time.perf_counter() - PROCESS_START:.2f}s")
+
+# Source sheet for the mapping rows ### Update for new runs
+GOOGLE_CREDENTIALS_FILE = 'GoogleCloudCredentials.json'
+SOURCE_SPREADSHEET = "Consistent_Google_Sheet_Source"
+SOURCE_WORKSHEET = "Source"
 
 # Set URL for repository
 repositories = {
@@ -45,21 +67,242 @@ repositories = {
     "Addiction": "https://example.com/document_sets/4898"
 }
 
-# Fetch all rows
-data = sheet.get_all_records()
+# Lightweight row tuple for the three columns the mapping loop uses
+MappingRow = namedtuple("MappingRow", ["row", "case", "learning_objective", "teaching_point"])
+MAPPING_HEADERS = ["Case", "Learning Objective", "Teaching Point"]
+
+# Read only the Case, Learning Objective and Teaching Point columns instead of the whole sheet
+def read_mapping_rows(sheets_client, sheet):
+    header_row = sheets_client.call(sheet.row_values, 1)
+    header_positions = {name.strip(): idx + 1 for idx, name in enumerate(header_row) if name}
+    headers = MAPPING_HEADERS
+    missing_headers = [header for header in headers if header not in header_positions]
+    if missing_headers:
+        raise ValueError(f"Headers not found in Source sheet: {missing_headers}")
+
+    # Convert column numbers into A1 letters and fetch each column range in one batch_get
+    from gspread.utils import rowcol_to_a1
+    column_letters = [rowcol_to_a1(1, header_positions[header])[:-1] for header in headers]
+    value_ranges = sheets_client.call(sheet.batch_get, [f"{letter}2:{letter}" for letter in column_letters], major_dimension="COLUMNS")
+    columns = [value_range[0] if value_range else [] for value_range in value_ranges]
+
+    # Trailing blank cells are trimmed by the API, so pad shorter columns with empty strings
+    row_count = max((len(column) for column in columns), default=0)
+    for offset in range(row_count):
+        values = tuple(column[offset] if offset < len(column) else "" for column in columns)
+        yield MappingRow(offset + 2, *values)  # +2 for the header row and Google Sheets 1-based index
+
+def load_mapping_rows():
+    # Google Sheets setup through the shared, quota-aware client
+    sheets_client = SheetsClient.shared(GOOGLE_CREDENTIALS_FILE)
+    sheet = sheets_client.open_worksheet(SOURCE_SPREADSHEET, SOURCE_WORKSHEET)
+
+    # Fetch the needed columns for all rows, or reuse the cached rows if the sheet is unchanged
+    rows = sheets_client.read_cached_rows(sheet, MAPPING_HEADERS, lambda: read_mapping_rows(sheets_client, sheet))
+    return [MappingRow(*row) for row in rows]
+
+# Organization credentials are read from .env only when the run has to sign in
+def load_org_credentials():
+    from dotenv import load_dotenv, find_dotenv
+
+    # locate .env, falling back to the process environment
+    dotenv_path = find_dotenv()
+    if dotenv_path:
+        load_dotenv(dotenv_path)
+    else:
+        logging.warning(".env file not found, using the process environment.")
+
+    # Environment Variables for Organization
+    Org_UN = os.environ.get('Org_User_ID')
+    Org_PW = os.environ.get('Org_Password')
+
+    # Ensure Org_UN and Org_PW are obtained
+    if not Org_UN or not Org_PW:
+        raise ValueError("Org_User_ID or Org_Password environment variables are not set.")
+
+    # Log for debugging values
+    logging.info(f"Org_UN={Org_UN}")
+    logging.info(f"Org_PW={'*' * len(Org_PW)}")  # Masks the password for privacy in logs
+    return Org_UN, Org_PW
+
+
+# Optional warm browser daemon started by the webscraper script (browser-daemon subcommand)
+# Its CDP port is unauthenticated, so the daemon is only used when BROWSER_DAEMON=1 (see the webscraper script)
+BROWSER_DAEMON = os.environ.get("BROWSER_DAEMON", "0") == "1"
+BROWSER_DAEMON_PORT = int(os.environ.get("BROWSER_DAEMON_PORT", 9333))
+BROWSER_DAEMON_ENDPOINT = os.environ.get("BROWSER_DAEMON_ENDPOINT", f"http://127.0.0.1:{BROWSER_DAEMON_PORT}")
+
+# Health check: the daemon's CDP endpoint answers /json/version when the browser is up
+def daemon_available(endpoint=BROWSER_DAEMON_ENDPOINT, timeout=0.5):
+    try:
+        with urllib.request.urlopen(f"{endpoint}/json/version", timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+# Connect to the warm browser daemon when it is running, otherwise launch Chromium locally
+def open_browser(playwright, storage_state=None, use_daemon=True):
+    if use_daemon and BROWSER_DAEMON and daemon_available():
+        try:
+            browser = playwright.chromium.connect_over_cdp(BROWSER_DAEMON_ENDPOINT)
+            logging.info(f"Connected to browser daemon at {BROWSER_DAEMON_ENDPOINT}")
+            # The daemon's persistent context keeps the login cookies from earlier runs
+            return browser, browser.contexts[0], True
+        except Exception as e:
+            logging.error(f"Failed to connect to browser daemon, falling back to local launch: {e}")
+
+    browser = playwright.chromium.launch(headless=True)
+    # Increased viewport height to stop visibility issues with buttons (Webpage Save and Add Row errors in CM Editor dropdown) - if causing load issues, resize
+    context = browser.new_context(viewport={'width': 1920, 'height': 2200, 'device_scale_factor': 1}, storage_state=storage_state) # increase context window, maintain pixel scale
+    return browser, context, False
+
+# A warm session lands on the site instead of being redirected to the sign-in page
+def is_authenticated(page):
+    try:
+        page.goto("https://example.com")
+        page.wait_for_load_state("domcontentloaded")
+        return "users/sign_in" not in page.url
+    except Exception as e:
+        logging.error(f"Error checking for an authenticated session: {e}")
+        return False
+
+# Networkidle resolves only after at least 500 ms without network traffic
+NETWORKIDLE_SECONDS = 0.5
+
+# Each step's deadline in seconds, and the fixed sleeps / networkidle waits it used to pay
+WAIT_STEPS = {
+    "repository listing": {"deadline": 10, "legacy": NETWORKIDLE_SECONDS + 1},
+    "case page": {"deadline": 10, "legacy": NETWORKIDLE_SECONDS},
+    "editor link": {"deadline": 10, "legacy": NETWORKIDLE_SECONDS * 2},
+    "editor": {"deadline": 20, "legacy": NETWORKIDLE_SECONDS},
+    "learning objectives": {"deadline": 20, "legacy": NETWORKIDLE_SECONDS},
+    "mapping modal": {"deadline": 10, "legacy": NETWORKIDLE_SECONDS},
+    "content mapping tool": {"deadline": 5, "legacy": 1},
+    "add row": {"deadline": 5, "legacy": 1},
+    "tp dropdown": {"deadline": 5, "legacy": 1},
+    "cme save": {"deadline": 10, "legacy": 1},
+    "continue": {"deadline": 5, "legacy": 1},
+    "publish button": {"deadline": 30, "legacy": 1},
+    "publish fallback": {"deadline": 10, "legacy": 10},
+    "publish confirm": {"deadline": 15, "legacy": 1},
+    "cancel banner": {"deadline": 5, "legacy": 1},
+    "publish reload": {"deadline": 20, "legacy": 5 + NETWORKIDLE_SECONDS},
+    "case map": {"deadline": 10, "legacy": 0},
+    "case map filter": {"deadline": 10, "legacy": 2},
+    "sidebar close": {"deadline": 5, "legacy": 1},
+    "push to om": {"deadline": 15, "legacy": 5},
+}
+
+# URL fragments of the XHRs that confirm save / publish / push; when one is empty that step keeps its legacy fixed wait,
+# since any write request (autosave, analytics) would otherwise end the wait before the real one finishes
+SAVE_RESPONSE_URL = os.environ.get("SAVE_RESPONSE_URL", "")
+PUBLISH_RESPONSE_URL = os.environ.get("PUBLISH_RESPONSE_URL", "")
+PUSH_RESPONSE_URL = os.environ.get("PUSH_RESPONSE_URL", "")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class WaitPolicy:
+    def __init__(self, page, steps=WAIT_STEPS):
+        self.page = page
+        self.steps = steps
+        self.stats = {}
 
-# Environment Variables for Organization
-Org_UN = os.environ.get('Org_User_ID')
-Org_PW = os.environ.get('Org_Password')
+    def deadline_ms(self, step):
+        return self.steps[step]["deadline"] * 1000
 
-# Ensure Org_UN and Org_PW are obtained
-if not Org_UN or not Org_PW:
-    raise ValueError("Org_User_ID or Org_Password environment variables are not set.")
+    @contextlib.contextmanager
+    def step(self, step):
+        # Time the step and record it against the legacy fixed wait for this step; errors still reach the caller
+        stats = self.stats.setdefault(step, {"count": 0, "waited": 0.0, "legacy": 0.0, "timeouts": 0})
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            stats["count"] += 1
+            stats["waited"] += time.monotonic() - start
+            stats["legacy"] += self.steps[step]["legacy"]
+
+    def deadline_hit(self, step, e):
+        self.stats[step]["timeouts"] += 1
+        logging.warning(f"Wait for '{step}' hit its {self.steps[step]['deadline']}s deadline: {e}")
+
+    def for_selector(self, step, target, state="visible"):
+        from playwright.sync_api import TimeoutError
+
+        # Accept a selector string or a ready-made locator
+        locator = self.page.locator(target) if isinstance(target, str) else target
+        with self.step(step):
+            try:
+                locator.first.wait_for(state=state, timeout=self.deadline_ms(step))
+                return True
+            except TimeoutError as e:
+                self.deadline_hit(step, e)
+                return False
 
-# Log for debugging values
-logging.info(f"Org_UN={Org_UN}")
-logging.info(f"Org_PW={'*' * len(Org_PW)}")  # Masks the password for privacy in logs
+    def for_url(self, step, fragment):
+        from playwright.sync_api import TimeoutError
 
+        with self.step(step):
+            try:
+                self.page.wait_for_url(lambda url: fragment in url, timeout=self.deadline_ms(step))
+                return True
+            except TimeoutError as e:
+                self.deadline_hit(step, e)
+                return False
+
+    @contextlib.contextmanager
+    def for_response(self, step, fragment=""):
+        from playwright.sync_api import TimeoutError
+
+        if not fragment:
+            if step not in self.stats:
+                logging.warning(f"No response URL fragment set for '{step}', keeping its {self.steps[step]['legacy']}s fixed wait")
+            with self.step(step):
+                yield
+                time.sleep(self.steps[step]["legacy"])
+            return
+
+        # Wrap the click that triggers the request, then wait for its write XHR to finish
+        def matches(response):
+            return response.request.method in WRITE_METHODS and fragment.lower() in response.url.lower()
+
+        # Only the wait for the response may run past its deadline; a failed or timed-out click goes to the caller
+        clicked = False
+        with self.step(step):
+            try:
+                with self.page.expect_response(matches, timeout=self.deadline_ms(step)) as response_info:
+                    yield
+                    clicked = True
+                response = response_info.value
+                if not response.ok:
+                    logging.warning(f"'{step}' request returned HTTP {response.status}: {response.url}")
+            except TimeoutError as e:
+                if not clicked:
+                    raise
+                self.deadline_hit(step, e)
+
+    @contextlib.contextmanager
+    def for_navigation(self, step):
+        from playwright.sync_api import TimeoutError
+
+        triggered = False
+        with self.step(step):
+            try:
+                with self.page.expect_navigation(wait_until="domcontentloaded", timeout=self.deadline_ms(step)):
+                    yield
+                    triggered = True
+            except TimeoutError as e:
+                if not triggered:
+                    raise
+                self.deadline_hit(step, e)
+
+    def report(self):
+        total_saved = 0
+        for step, stats in self.stats.items():
+            saved = stats["legacy"] - stats["waited"]
+            total_saved += saved
+            logging.info(f"Wait '{step}': {stats['count']} waits, {stats['waited']:.1f}s waited vs {stats['legacy']:.1f}s legacy, saved {saved:.1f}s, {stats['timeouts']} deadline hits")
+        logging.info(f"Wait policy saved {total_saved:.1f}s versus the legacy fixed waits")
 
 # Get manual backup if 2FA method fails
 def get_manual_2fa_code():
@@ -91,14 +334,13 @@ def scroll_around(page):
         logging.error(f"scroll_around method failed: {e}")
 
 # Method to parse Google Sheet, then use it to find the right case
-def find_and_select_case(page, case):
+def find_and_select_case(page, case, wait_policy):
 
     try:
         # Navigate to document repository based on case name
         case_repository_key = case.strip().split()[0]
         if case_repository_key in repositories:
             page.goto(repositories[case_repository_key])
-            page.wait_for_load_state("networkidle")
             logging.info(f"Navigated to document repository: {page.url}")
 
         # Check if we were redirected to the login page due to session expiry
@@ -110,7 +352,7 @@ def find_and_select_case(page, case):
         page.keyboard.press("PageDown")
         page.keyboard.press("PageDown")
         page.keyboard.press("PageDown")
-        time.sleep(1)
+        wait_policy.for_selector("repository listing", "td.title a")
         page.keyboard.press("Home")
 
         # Select and click the case title with CSS selector and xpath backup
@@ -141,9 +383,7 @@ def find_and_select_case(page, case):
                 logging.error(f"Failed to click {case} using Xpath: {e}")
             
 
-        page.wait_for_function("() => window.location.href.includes('/document_set_document_relations')", timeout=10000)
-        page.wait_for_load_state("networkidle")
-        return True
+        return wait_policy.for_url("case page", "/document_set_document_relations")
 
 
     except Exception as e:
@@ -167,7 +407,7 @@ def verify_learning_objective_in_table(page, learning_objective, teaching_point)
         # Iterate through rows to find the matching learning objective and teaching point
         for row_locator in rows_locators.element_handles():
             row_text = row_locator.inner_text()
-            logging.info(f"Logging a verification table row's inner text for examination: {row_text}")
+            payload_logger.debug(f"Logging a verification table row's inner text for examination: {row_text}", extra=LOG_SAMPLED)
             short_learning_objective = learning_objective[:20]
             short_teaching_point = teaching_point[:20]
             if short_learning_objective in row_text and short_teaching_point in row_text:
@@ -180,6 +420,593 @@ def verify_learning_objective_in_table(page, learning_objective, teaching_point)
         logging.error(f"No match for LO & TP found in Case Map: {e}")
         return False
 
+# Minimum difflib ratio for a fuzzy Teaching Point match in the dropdown, and how far it has to beat the runner-up option;
+# numbered Teaching Points ("Teaching Point 2: ..." / "Teaching Point 3: ...") differ by a character, so their numbers must agree too
+TP_FUZZY_CUTOFF = float(os.environ.get("TP_FUZZY_CUTOFF", 0.85))
+TP_FUZZY_MIN_MARGIN = float(os.environ.get("TP_FUZZY_MIN_MARGIN", 0.1))
+# Shortest text a prefix match may rest on, the length the old truncated fallback used
+TP_PREFIX_MIN_CHARS = 20
+
+
+# Collapse whitespace and case so sheet text matches what the editor renders
+def normalize_label(text):
+    return " ".join(text.split()).casefold()
+
+
+# Lookup table over the Teaching Point <select>, read in one evaluate per editor session
+class TeachingPointOptions:
+    def __init__(self, options):
+        self.values = {}
+        self.texts = []
+        for option in options:
+            text = normalize_label(option["text"])
+            # Skip the placeholder option and keep the first of any duplicate labels
+            if option["value"] and text and text not in self.values:
+                self.values[text] = option["value"]
+                self.texts.append(text)
+
+    @classmethod
+    def from_select(cls, combobox):
+        options = combobox.evaluate("select => Array.from(select.options, option => ({text: option.text, value: option.value}))")
+        logging.info(f"Read {len(options)} Teaching Point options from dropdown")
+        return cls(options)
+
+    def lookup(self, teaching_point):
+        # Exact, then prefix either way (sheet or option text truncated), then fuzzy; returns (value, tier).
+        # Anything that could name more than one option returns (None, None) so the row fails into the retry list
+        target = normalize_label(teaching_point)
+        if not target:
+            return None, None
+        if target in self.values:
+            return self.values[target], "exact"
+        prefix_matches = [text for text in self.texts if min(len(text), len(target)) >= TP_PREFIX_MIN_CHARS and (text.startswith(target) or target.startswith(text))]
+        if len(prefix_matches) > 1:
+            logging.warning(f"{len(prefix_matches)} Teaching Point options share the prefix '{teaching_point}', not choosing between them")
+            return None, None
+        if prefix_matches:
+            return self.values[prefix_matches[0]], "prefix"
+
+        # Score the two closest options, including a runner-up just under the cutoff, and take the best only on a clear margin
+        matcher = difflib.SequenceMatcher(b=target)
+        scores = []
+        for text in difflib.get_close_matches(target, self.texts, n=2, cutoff=max(TP_FUZZY_CUTOFF - TP_FUZZY_MIN_MARGIN, 0)):
+            matcher.set_seq1(text)
+            scores.append((matcher.ratio(), text))
+        if not scores or scores[0][0] < TP_FUZZY_CUTOFF:
+            return None, None
+        best_score, best_text = scores[0]
+        runner_up_score = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score - runner_up_score < TP_FUZZY_MIN_MARGIN:
+            logging.warning(f"Fuzzy Teaching Point match for '{teaching_point}' is ambiguous: '{best_text}' {best_score:.2f} vs '{scores[1][1]}' {runner_up_score:.2f}")
+            return None, None
+        if re.findall(r"\d+", best_text) != re.findall(r"\d+", target):
+            logging.warning(f"Fuzzy Teaching Point match '{teaching_point}' -> '{best_text}' has different numbers, not using it")
+            return None, None
+        logging.info(f"Fuzzy Teaching Point match: '{teaching_point}' -> '{best_text}' ({best_score:.2f})")
+        return self.values[best_text], "fuzzy"
+
+# Learning Objectives in the editor; misses on the full text retry with a 40 character prefix
+LEARNING_OBJECTIVE_SELECTOR = "div.learning-objective-content"
+LO_PREFIX_CHARS = 40
+
+
+# One in-page snapshot of every Learning Objective, matched in memory and clicked by index
+class LearningObjectiveIndex:
+    def __init__(self, page):
+        self.locator = page.locator(LEARNING_OBJECTIVE_SELECTOR)
+        self.texts = [normalize_label(text) for text in self.locator.evaluate_all("elements => elements.map(element => element.innerText)")]
+        logging.info(f"Indexed {len(self.texts)} Learning Objectives in editor")
+
+    def find(self, learning_objective):
+        return find_learning_objective(self.texts, learning_objective)
+
+    def click(self, index):
+        element = self.locator.nth(index)
+        element.scroll_into_view_if_needed()
+        element.click()
+
+    def element_id(self, index):
+        return self.locator.nth(index).evaluate(LEARNING_OBJECTIVE_ID_SCRIPT, list(LEARNING_OBJECTIVE_ID_ATTRIBUTES))
+
+# Full text contained in the element, then its 40 character prefix; returns the element index
+def find_learning_objective(texts, learning_objective):
+    target = normalize_label(learning_objective)
+    for needle in (target, target[:LO_PREFIX_CHARS]):
+        for index, text in enumerate(texts):
+            if needle and needle in text:
+                return index
+    return None
+
+# A Learning Objective's id: the digits of the first of these attributes on the element or its two nearest ancestors
+LEARNING_OBJECTIVE_ID_ATTRIBUTES = ("data-learning-objective-id", "data-objective-id", "data-id", "id")
+LEARNING_OBJECTIVE_ID_SCRIPT = """(element, names) => {
+    for (let node = element, level = 0; node && level < 3; node = node.parentElement, level++) {
+        for (const name of names) {
+            const digits = (node.getAttribute(name) || "").match(/\\d+/);
+            if (digits) return digits[0];
+        }
+    }
+    return "";
+}"""
+
+# Persistent per-row journal so reruns skip mappings that were already applied and verified
+RPA_JOURNAL_PATH = os.environ.get("RPA_JOURNAL_PATH", "mapping_journal.jsonl")
+RPA_MAX_ATTEMPTS = int(os.environ.get("RPA_MAX_ATTEMPTS", 2))
+JOURNAL_DONE_STATUSES = ("verified", "skipped_existing")
+# Predicted time for a row of a case with no journal history yet, when nothing else is known
+RPA_DEFAULT_ROW_SECONDS = float(os.environ.get("RPA_DEFAULT_ROW_SECONDS", 90))
+
+
+class RunJournal:
+    def __init__(self, path=RPA_JOURNAL_PATH):
+        self.path = path
+        self.statuses = {}
+        # Past row times by case, for predicting what fits in a run budget
+        self.case_seconds = collections.defaultdict(list)
+        self.load()
+
+    @staticmethod
+    def key(row):
+        # Sheet row numbers shift when rows are inserted, so key on the mapping itself
+        return f"{row.case.strip()}|{row.learning_objective.strip()}|{row.teaching_point.strip()}"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        line = ""
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write can leave a truncated last line
+                    logging.warning(f"Skipping unreadable journal line in {self.path}")
+                    continue
+                self.statuses[entry["key"]] = entry["status"]
+                if "seconds" in entry:
+                    self.case_seconds[entry["key"].split("|")[0]].append(entry["seconds"])
+        # Terminate a truncated last line so the next entry starts on its own line
+        if line and not line.endswith("\n"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+        logging.info(f"Loaded {len(self.statuses)} journal entries from {self.path}")
+
+    def status(self, row):
+        return self.statuses.get(self.key(row))
+
+    def done(self, row):
+        return self.status(row) in JOURNAL_DONE_STATUSES
+
+    def predicted_seconds(self, row):
+        # Mean of the case's past rows, else the median row time across all cases
+        case_seconds = self.case_seconds.get(row.case.strip())
+        if case_seconds:
+            return sum(case_seconds) / len(case_seconds)
+        all_seconds = [seconds for times in self.case_seconds.values() for seconds in times]
+        return statistics.median(all_seconds) if all_seconds else RPA_DEFAULT_ROW_SECONDS
+
+    def record(self, row, status, error=None, seconds=None):
+        key = self.key(row)
+        self.statuses[key] = status
+        entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "key": key, "row": row.row, "status": status}
+        if error:
+            entry["error"] = error
+        if seconds is not None:
+            entry["seconds"] = round(seconds, 1)
+            self.case_seconds[row.case.strip()].append(entry["seconds"])
+        # Append and fsync so the entry survives the process dying on the next row
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+# Work queue: leased mapping rows in SQLite (automation_common/work_queue.py) so several worker processes on this host can share one plan
+WORK_QUEUE_FILE = os.environ.get("WORK_QUEUE_FILE", "mapping-queue.sqlite3")
+WORK_LEASE_SECONDS = int(os.environ.get("WORK_LEASE_SECONDS", 300))
+WORK_MAX_ATTEMPTS = RPA_MAX_ATTEMPTS
+
+
+class WorkQueue(automation_common.work_queue.WorkQueue):
+    def __init__(self, path=WORK_QUEUE_FILE, lease_seconds=WORK_LEASE_SECONDS, max_attempts=WORK_MAX_ATTEMPTS):
+        super().__init__(path, lease_seconds, max_attempts)
+
+# Queue workers: each process runs its own browser from the session one worker saved after logging in
+AUTH_STATE_FILE = os.environ.get("AUTH_STATE_FILE", "mapping-auth-state.json")
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", 2))
+
+# The saved session holds live login cookies, so only this user may read it and it is removed once the workers finish
+def save_storage_state(context, path=AUTH_STATE_FILE):
+    state = context.storage_state()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        # O_CREAT keeps the mode of a file left by an older run
+        os.chmod(path, 0o600)
+        json.dump(state, f)
+
+def remove_storage_state(work_queue, path=AUTH_STATE_FILE):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+    # The next workers log in again instead of looking for the removed session
+    work_queue.requeue("auth", "session")
+
+# Queue one item per case holding its mappings the journal does not have as done; failed cases get a fresh set of attempts.
+# A case is the unit of work so only one worker at a time has its editor open, publishes and pushes it to OM.
+def enqueue_rows(work_queue, data):
+    journal = RunJournal()
+    work_queue.put("auth", "session")
+    work_queue.requeue("auth", "session")
+    rows_by_case = collections.defaultdict(list)
+    for row in data:
+        if not journal.done(row):
+            rows_by_case[row.case].append(list(row))
+    for case, rows in rows_by_case.items():
+        work_queue.put("rpa_cases", case, rows)
+        work_queue.update_payload("rpa_cases", case, rows)
+        work_queue.requeue("rpa_cases", case)
+    pending = sum(len(rows) for rows in rows_by_case.values())
+    logging.info(f"Queued {pending} mapping rows in {len(rows_by_case)} cases in {work_queue.path}")
+    return pending
+
+# Returns (auth item, None) when this worker should log in, or (None, state file) once another worker has
+def claim_shared_login(work_queue, owner):
+    while True:
+        item = work_queue.lease("auth", owner)
+        if item is not None:
+            return item, None
+        status = work_queue.status("auth", "session")
+        if status == "done":
+            return None, AUTH_STATE_FILE
+        if status not in ("pending", "leased"):
+            raise Exception(f"Shared login is {status}, run the enqueue subcommand first")
+        # Another worker is logging in; if it dies its lease expires and this loop takes over
+        time.sleep(2)
+
+# Extend a lease from a side thread while the row runs; sqlite connections stay on the thread that opened them
+def keep_lease(path, item, owner, stop):
+    work_queue = WorkQueue(path)
+    try:
+        while not stop.wait(work_queue.lease_seconds / 3):
+            if not work_queue.heartbeat(item, owner):
+                logging.error(f"Lost the lease on case {item.key}, another worker may pick it up")
+                return
+    finally:
+        work_queue.close()
+
+# Case Map rows in the editor's reasoning tool panel
+CASE_MAP_TABLE_SELECTOR = ".reasoning-tool-panel .fixed-height-table table.pure-table"
+
+# Pre-check: open the Case Map once and read every row's text in a single evaluate
+def read_case_map(page, wait_policy):
+    page.get_by_role("link", name="CASE MAP").click()
+    wait_policy.for_selector("case map", CASE_MAP_TABLE_SELECTOR, state="attached")
+    table = page.eval_on_selector(CASE_MAP_TABLE_SELECTOR, """table => ({
+        headers: Array.from(table.querySelectorAll("thead th"), cell => cell.innerText),
+        rows: Array.from(table.querySelectorAll("tbody tr"), row => Array.from(row.cells, cell => cell.innerText))
+    })""")
+    # Close the sidebar again so the editor is usable
+    page.get_by_role("link", name="CASE MAP").click()
+
+    # Keep each row's Learning Objective and Teaching Point cells, found by their column headers
+    headers = [normalize_label(header) for header in table["headers"]]
+    learning_objective_column = next((index for index, header in enumerate(headers) if "objective" in header), None)
+    teaching_point_column = next((index for index, header in enumerate(headers) if "teaching" in header), None)
+    if learning_objective_column is None or teaching_point_column is None:
+        raise Exception(f"Case Map has no Learning Objective and Teaching Point columns: {table['headers']}")
+    rows = [(normalize_label(cells[learning_objective_column]), normalize_label(cells[teaching_point_column]))
+            for cells in table["rows"] if len(cells) > max(learning_objective_column, teaching_point_column)]
+    logging.info(f"Read {len(rows)} existing Case Map rows")
+    return rows
+
+# A row counts only when its own Learning Objective and Teaching Point cells both match in full
+def mapping_in_case_map(case_map_rows, learning_objective, teaching_point):
+    return (normalize_label(learning_objective), normalize_label(teaching_point)) in case_map_rows
+
+# Verify published mappings once per case, after the main loop leaves it; RPA_ASYNC_VERIFY=0 keeps verification inline after each publish
+RPA_ASYNC_VERIFY = os.environ.get("RPA_ASYNC_VERIFY", "1") == "1"
+
+
+class MappingVerifier:
+    # Checks published rows against the Case Map in a second context of the main browser, seeded with the main
+    # context's session. Playwright's sync API is bound to the thread that started it, so the checks run on the
+    # main thread: a case's rows are checked together, with one Case Map read, once the main loop leaves the case.
+    def __init__(self, browser, storage_state):
+        self.browser = browser
+        self.storage_state = storage_state
+        self.results = []
+        # Rows of the case the main loop is on, held back so two editor sessions never open the same case
+        self.held = []
+        self.context = None
+
+    def start(self):
+        self.context = self.browser.new_context(viewport={'width': 1920, 'height': 2200, 'device_scale_factor': 1}, storage_state=self.storage_state)
+        self.page = self.context.new_page()
+        self.wait_policy = WaitPolicy(self.page)
+
+    def submit(self, row):
+        self.advance(row.case)
+        self.held.append(row)
+
+    def advance(self, case):
+        # Called by the main loop before it works on a case: rows of any other case are safe to verify now
+        if self.held and self.held[0].case != case:
+            self.release()
+
+    def release(self):
+        rows, self.held = self.held, []
+        if not rows:
+            return
+        try:
+            self.verify_case(self.page, self.wait_policy, rows[0].case, rows)
+        except Exception as e:
+            # Unverified rows get re-applied, and the re-application's Case Map pre-check skips the ones that did land
+            logging.error(f"Verifier failed on {rows[0].case}: {e}")
+            self.results.extend((row, False, f"Verification failed: {e}") for row in rows)
+
+    def drain(self):
+        # (row, verified, error) for every row checked so far
+        results, self.results = self.results, []
+        return results
+
+    def wait(self):
+        # Check the rows still held; the main loop is done editing by now
+        self.release()
+        return self.drain()
+
+    def close(self):
+        self.release()
+        if self.context is not None:
+            self.wait_policy.report()
+            self.context.close()
+            self.context = None
+        return self.drain()
+
+    def verify_case(self, page, wait_policy, case, rows):
+        try:
+            if not find_and_select_case(page, case, wait_policy):
+                raise Exception(f"Failed to locate and select case: {case}")
+            page.locator(".panel a.button[href*='/edit']:has-text('Editor')").first.click()
+            if not wait_policy.for_url("editor", "/versions"):
+                raise Exception(f"Failed to enter Editor for {case}")
+            case_map_rows = read_case_map(page, wait_policy)
+        except Exception as e:
+            logging.error(f"Verifier could not read the Case Map for {case}: {e}")
+            for row in rows:
+                self.results.append((row, False, f"Verification failed: {e}"))
+            return
+        for row in rows:
+            verified = mapping_in_case_map(case_map_rows, row.learning_objective, row.teaching_point)
+            logging.info(f"Verifier: Case={case}, Learning Objective={row.learning_objective}, Teaching Point={row.teaching_point} {'verified' if verified else 'NOT in Case Map'}")
+            self.results.append((row, verified, None if verified else "Mapping not found in Case Map after publish"))
+
+# Editor API mode: replay the editor's own XHR calls through the logged-in context instead of driving the UI
+EDITOR_API_TEMPLATE_FILE = os.environ.get("EDITOR_API_TEMPLATE_FILE", "editor_api_template.json")
+# Headers worth keeping from a captured call; cookies come from the context's request client
+EDITOR_API_HEADERS = ("content-type", "accept", "x-requested-with", "x-csrf-token")
+EDITOR_API_ENCODINGS = ("raw", "json", "form", "url")
+CSRF_META_PATTERN = re.compile(r'<meta[^>]+name="csrf-token"[^>]+content="([^"]+)"')
+OPTION_PATTERN = re.compile(r'<option[^>]*value="([^"]*)"[^>]*>(.*?)</option>', re.S)
+PLACEHOLDER_PATTERN = re.compile(r"%%(\w+):(\w+)%%")
+
+def encode_value(value, encoding):
+    if encoding == "json":
+        return json.dumps(value)[1:-1]
+    if encoding == "form":
+        return urllib.parse.quote_plus(value)
+    if encoding == "url":
+        return urllib.parse.quote(value, safe="")
+    return value
+
+def templatize(text, values):
+    # Swap each known value for %%name:encoding%%, longest first, only where it is not part of a longer token
+    if not text:
+        return text
+    # In a JSON body a plain value reads the same raw or escaped; tag it json so replayed quotes get escaped
+    encodings = ("json", "form", "url", "raw") if text.lstrip()[:1] in ("{", "[") else EDITOR_API_ENCODINGS
+    for name, value in sorted(values.items(), key=lambda item: -len(item[1])):
+        if len(value) < 2:
+            continue
+        for encoding in encodings:
+            pattern = rf"(?<![0-9A-Za-z]){re.escape(encode_value(value, encoding))}(?![0-9A-Za-z])"
+            text = re.sub(pattern, f"%%{name}:{encoding}%%", text)
+    return text
+
+def fill_template(text, values):
+    if not text:
+        return text
+    return PLACEHOLDER_PATTERN.sub(lambda match: encode_value(values[match.group(1)], match.group(2)), text)
+
+def editor_api_phase(url):
+    # Mapping calls repeat per row; the publish and push calls go once per case
+    if (PUBLISH_RESPONSE_URL and PUBLISH_RESPONSE_URL in url) or "publish" in url.lower():
+        return "publish"
+    if (PUSH_RESPONSE_URL and PUSH_RESPONSE_URL in url) or "push" in url.lower():
+        return "push"
+    return "mapping"
+
+def build_editor_api_template(captured, values):
+    requests = [{
+        "phase": editor_api_phase(request["url"]),
+        "method": request["method"],
+        "url": templatize(request["url"], values),
+        "headers": {name: templatize(value, values) for name, value in request["headers"].items()},
+        "data": templatize(request["data"], values),
+    } for request in captured]
+    # Numbers left after templatizing are usually ids of the captured case; list constants here once reviewed
+    return {"captured_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "placeholders": sorted(values), "reviewed_literals": [], "requests": requests}
+
+# Multi-digit numbers outside placeholders (%XX escapes excluded), which a replay would send unchanged to every case
+NUMERIC_LITERAL_PATTERN = re.compile(r"(?<![0-9A-Za-z%])\d{2,}(?![0-9A-Za-z])")
+# Each mapping call has to name the case, the Learning Objective and the Teaching Point through placeholders
+CASE_PLACEHOLDERS = {"version_id", "case_id", "document_id"}
+LEARNING_OBJECTIVE_PLACEHOLDERS = {"learning_objective_id", "learning_objective"}
+TEACHING_POINT_PLACEHOLDERS = {"teaching_point_value", "teaching_point"}
+
+def unreviewed_literals(template):
+    literals = set()
+    for request in template["requests"]:
+        for text in (request["url"], request["data"] or "", *request["headers"].values()):
+            literals.update(NUMERIC_LITERAL_PATTERN.findall(PLACEHOLDER_PATTERN.sub("", text)))
+    return sorted(literals - set(template.get("reviewed_literals", [])))
+
+def request_placeholders(request):
+    texts = (request["url"], request["data"] or "", *request["headers"].values())
+    return {match.group(1) for text in texts for match in PLACEHOLDER_PATTERN.finditer(text)}
+
+def check_editor_api_template(template):
+    # Refuse a template that could write to the captured case, or to the wrong Learning Objective, on replay
+    literals = unreviewed_literals(template)
+    if literals:
+        raise ValueError(f"Template still has numeric literals {literals}; replace ids with placeholders and list real constants in reviewed_literals")
+    mapping_requests = [request for request in template["requests"] if request["phase"] == "mapping"]
+    if not mapping_requests:
+        raise ValueError("Template has no mapping calls")
+    for request in template["requests"]:
+        placeholders = request_placeholders(request)
+        required = [CASE_PLACEHOLDERS]
+        if request["phase"] == "mapping":
+            required += [LEARNING_OBJECTIVE_PLACEHOLDERS, TEACHING_POINT_PLACEHOLDERS]
+        for names in required:
+            if not placeholders & names:
+                raise ValueError(f"{request['phase']} call {request['method']} {request['url']} has none of the placeholders {sorted(names)}")
+
+def last_number(text):
+    numbers = re.findall(r"\d+", urllib.parse.urlsplit(text).path)
+    return numbers[-1] if numbers else ""
+
+
+class LearningObjectiveParser(html.parser.HTMLParser):
+    # Learning Objective texts and ids from the editor HTML, by the same rules as LearningObjectiveIndex in the browser
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.open_elements = []
+        self.objective_depth = None
+        self.objectives = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.VOID_TAGS:
+            return
+        self.open_elements.append((tag, dict(attrs)))
+        if self.objective_depth is None and "learning-objective-content" in (dict(attrs).get("class") or "").split():
+            self.objective_depth = len(self.open_elements)
+            self.objectives.append([self.element_id(), []])
+
+    def handle_endtag(self, tag):
+        # Pop back to the matching open tag, so implied closes (<p>, <li>) don't throw the nesting off
+        for depth in range(len(self.open_elements) - 1, -1, -1):
+            if self.open_elements[depth][0] == tag:
+                del self.open_elements[depth:]
+                break
+        if self.objective_depth is not None and len(self.open_elements) < self.objective_depth:
+            self.objective_depth = None
+
+    def handle_data(self, data):
+        if self.objective_depth is not None:
+            self.objectives[-1][1].append(data)
+
+    def element_id(self):
+        for _, attrs in reversed(self.open_elements[-3:]):
+            for name in LEARNING_OBJECTIVE_ID_ATTRIBUTES:
+                digits = re.search(r"\d+", attrs.get(name) or "")
+                if digits:
+                    return digits.group()
+        return ""
+
+    @classmethod
+    def parse(cls, editor_page):
+        parser = cls()
+        parser.feed(editor_page)
+        parser.close()
+        return [(element_id, normalize_label(" ".join(parts))) for element_id, parts in parser.objectives]
+
+
+class EditorApi:
+    # Applies a case's mappings by replaying the captured editor calls through the context's request client
+    def __init__(self, context, template):
+        self.request = context.request
+        self.template = template
+
+    @classmethod
+    def load(cls, context, path=EDITOR_API_TEMPLATE_FILE):
+        with open(path, encoding="utf-8") as f:
+            template = json.load(f)
+        check_editor_api_template(template)
+        logging.info(f"Loaded {len(template['requests'])} editor API calls captured at {template['captured_at']} from {path}")
+        return cls(context, template)
+
+    def get_page(self, url):
+        response = self.request.get(url)
+        if not response.ok:
+            raise Exception(f"GET {url} returned {response.status}")
+        return response.url, response.text()
+
+    def open_case(self, case):
+        # Repository listing -> case page -> editor as plain GETs; the editor redirects to its version URL
+        repository_url = repositories.get(case.strip().split()[0])
+        if repository_url is None:
+            raise Exception(f"No repository URL for case: {case}")
+        _, listing = self.get_page(repository_url)
+        position = listing.find(html.escape(case, quote=False))
+        case_link = re.search(r'href="([^"]+)"', listing[listing.rfind("<a ", 0, position):position]) if position >= 0 else None
+        if case_link is None:
+            raise Exception(f"Case not found in repository listing: {case}")
+        case_url, case_page = self.get_page(urllib.parse.urljoin(repository_url, html.unescape(case_link.group(1))))
+        editor_link = re.search(r'href="([^"]*/edit[^"]*)"', case_page)
+        if editor_link is None:
+            raise Exception(f"Editor link not found for case: {case}")
+        editor_url, editor_page = self.get_page(urllib.parse.urljoin(case_url, html.unescape(editor_link.group(1))))
+
+        version_id = re.search(r"/versions/(\d+)", editor_url)
+        csrf_token = CSRF_META_PATTERN.search(editor_page)
+        options = TeachingPointOptions([
+            {"value": html.unescape(value), "text": html.unescape(re.sub(r"<[^>]+>", "", text))}
+            for value, text in OPTION_PATTERN.findall(editor_page)
+        ])
+        learning_objectives = LearningObjectiveParser.parse(editor_page)
+        if version_id is None or csrf_token is None or not options.texts:
+            raise Exception(f"Editor page for {case} is missing the version id, CSRF token or Teaching Point options")
+        case_values = {
+            "version_id": version_id.group(1), "csrf_token": csrf_token.group(1),
+            "case_id": last_number(case_url), "document_id": last_number(urllib.parse.urljoin(case_url, html.unescape(editor_link.group(1))))
+        }
+        return case_values, options, learning_objectives
+
+    def send(self, request, values):
+        url = fill_template(request["url"], values)
+        response = self.request.fetch(
+            url, method=request["method"], data=fill_template(request["data"], values),
+            headers={name: fill_template(value, values) for name, value in request["headers"].items()}
+        )
+        if not response.ok:
+            raise Exception(f"{request['method']} {url} returned {response.status}")
+
+    def apply_case(self, case, rows):
+        # Resolve and fill every call before sending anything, so a lookup miss or a value missing from this case
+        # leaves the case untouched for the UI path
+        case_values, options, learning_objectives = self.open_case(case)
+        row_values = []
+        for row in rows:
+            option_value, tier = options.lookup(row.teaching_point)
+            if option_value is None:
+                raise Exception(f"Teaching Point not found in editor options: {row.teaching_point}")
+            objective_index = find_learning_objective([text for _, text in learning_objectives], row.learning_objective)
+            if objective_index is None:
+                raise Exception(f"Learning Objective not found in editor page: {row.learning_objective}")
+            row_values.append(dict(case_values, learning_objective=row.learning_objective, learning_objective_id=learning_objectives[objective_index][0],
+                                   teaching_point=row.teaching_point, teaching_point_value=option_value))
+
+        calls = [(request, values) for values in row_values for request in self.template["requests"] if request["phase"] == "mapping"]
+        calls += [(request, row_values[-1]) for phase in ("publish", "push") for request in self.template["requests"] if request["phase"] == phase]
+        for request, values in calls:
+            missing = [name for name in request_placeholders(request) if not values.get(name)]
+            if missing:
+                raise Exception(f"No value for {missing} in {case}, needed by {request['method']} {request['url']}")
+        for request, values in calls:
+            self.send(request, values)
+        logging.info(f"Applied {len(rows)} mappings for {case} through the editor API")
+
+
 def get_2fa_code(context, Org_UN, Org_PW):
     try:
         page1 = context.new_page()
@@ -303,13 +1130,12 @@ def get_2fa_code(context, Org_UN, Org_PW):
         return None
 
 # Method to run the actual Playwright edit loop
-def run(playwright: Playwright) -> None:
+def run(playwright: "Playwright", data, work_queue=None, owner=None, budget_seconds=None, use_api=False, capture_api=False) -> None:
     # Updated the locate_and_click method to include more rudimentary Playwright methods prior to falling back to xpath and css attempts
-    def locate_and_click(page: Page, fallback_css: str, primary_xpath: str, description: str, element_type: str, retries: int = 3, wait_time: int = 1000):
+    def locate_and_click(page: "Page", fallback_css: str, primary_xpath: str, description: str, element_type: str, retries: int = 3, wait_time: int = 1000):
         for attempt in range(retries):
             try:
                 logging.info(f"Attempt {attempt + 1}: Trying to click '{description}' using direct Playwright methods.")
-                page.wait_for_load_state("networkidle", timeout=wait_time)
                 page.wait_for_load_state("domcontentloaded", timeout=wait_time)
             
                 # Attempt using text
@@ -364,7 +1190,6 @@ def run(playwright: Playwright) -> None:
                 if not element.is_enabled():
                     raise Exception(f"Element '{description}' is visible but not enabled.")
                 element.click(timeout=wait_time)
-                page.wait_for_load_state("networkidle", timeout=wait_time)
                 logging.info(f"Click successful using XPath for '{description}'")
                 return
             except Exception as e:
@@ -380,7 +1205,6 @@ def run(playwright: Playwright) -> None:
                             raise Exception(f"Fallback element '{description}' is visible but not enabled.")
                         element.scroll_into_view_if_needed()
                         element.click(timeout=wait_time)
-                        page.wait_for_load_state("networkidle", timeout=wait_time)
                         logging.info(f"Click successful using fallback CSS for '{description}'")
                         return
                     except Exception as e:
@@ -389,412 +1213,672 @@ def run(playwright: Playwright) -> None:
             # Added delay between retries
             time.sleep(1)
 
+    auth_item = None
     try:
-        browser = playwright.chromium.launch(headless=True)
-        # Increased viewport height to stop visibility issues with buttons (Webpage Save and Add Row errors in CM Editor dropdown) - if causing load issues, resize
-        context = browser.new_context(viewport={'width': 1920, 'height': 2200, 'device_scale_factor': 1}) # increase context window, maintain pixel scale
+        # Queue workers share one login instead of each going through 2FA
+        auth_item, storage_state = claim_shared_login(work_queue, owner) if work_queue is not None else (None, None)
+        browser, context, daemon_connected = open_browser(playwright, storage_state, use_daemon=work_queue is None)
+
+        # Close our own pages only when connected to the daemon, so its warm context stays alive
+        def close_browser():
+            wait_policy.report()
+            if daemon_connected:
+                page.close()
+            else:
+                context.close()
+            browser.close()
 
         page = context.new_page()
-
-        # Sign into Organization
-        page.goto("https://example.com/users/sign_in")
-        page.wait_for_load_state("networkidle")
-        logging.info(f"Accessed Organization page: {page.url}")
-        page.get_by_label("Email").fill(Org_UN)
-        page.get_by_label("Password").fill(Org_PW)
-        page.keyboard.press("Enter")
-
-        # Fetch the 2FA code from Google Mail
-        code = get_2fa_code(context, Org_UN, Org_PW)
-        logging.info(f"2FA code retrieved from email: {code}")
-        if not code:
-            logging.info("Fallback to manual entry for 2FA code")
-            code = get_manual_2fa_code()
-
-        logging.info(f"2FA code received from user: {code}")
-        if not code:
-            raise Exception("2FA code is not retrieved properly")
-
-        # Input 2FA code
-        page.wait_for_load_state("domcontentloaded", timeout=10000)
-        logging.info(f"Arrived at 2FA page: {page.url}")
-        page.get_by_label("Please enter the time-").fill(code)
-        
-        # Hit Submit to enter Organization Learning Management System
-        try:
+        wait_policy = WaitPolicy(page)
+
+        # Skip the login and 2FA flow when the browser daemon's session is still signed in
+        if storage_state:
+            logging.info(f"Reusing the session saved to {storage_state}")
+        elif daemon_connected and is_authenticated(page):
+            logging.info("Reusing authenticated session from browser daemon")
+        else:
+            Org_UN, Org_PW = load_org_credentials()
+
+            # Sign into Organization
+            page.goto("https://example.com/users/sign_in")
+            page.wait_for_load_state("networkidle")
+            logging.info(f"Accessed Organization page: {page.url}")
+            page.get_by_label("Email").fill(Org_UN)
+            page.get_by_label("Password").fill(Org_PW)
+            page.keyboard.press("Enter")
+
+            # Fetch the 2FA code from Google Mail
+            code = get_2fa_code(context, Org_UN, Org_PW)
+            logging.info(f"2FA code retrieved from email: {code}")
+            if not code:
+                logging.info("Fallback to manual entry for 2FA code")
+                code = get_manual_2fa_code()
+
+            logging.info(f"2FA code received from user: {code}")
+            if not code:
+                raise Exception("2FA code is not retrieved properly")
+
+            # Input 2FA code
+            page.wait_for_load_state("domcontentloaded", timeout=10000)
+            logging.info(f"Arrived at 2FA page: {page.url}")
+            page.get_by_label("Please enter the time-").fill(code)
+    
+            # Hit Submit to enter Organization Learning Management System
+            try:
+                locate_and_click(page, 
+                             "#sign_in_form > div > div > div > input[type=submit]", 
+                             """//*[@id="sign_in_form"]/div/div/div/input""", 
+                             "Submit",
+                             "input")
+            except Exception:
+                if page.url == "https://example.com":
+                    logging.info("Navigation to Organization already successful")
+                else:
+                    SystemExit
+
+            # Save the session for the other queue workers
+            if auth_item is not None:
+                save_storage_state(context)
+                work_queue.complete(auth_item, owner)
+                auth_item = None
+                logging.info(f"{owner} logged in and saved the session to {AUTH_STATE_FILE}")
+
+        journal = RunJournal()
+        # Case Map rows read during the pre-check, cached per case for the rest of the run
+        case_maps = {}
+        # Teaching Point dropdown options, cached per case since every mapping on it shares the list
+        tp_option_maps = {}
+        # Values seen in the editor during an API capture, turned into the template's placeholders
+        editor_values = {}
+
+        def push_to_om():
+            # Ensure that sidebar is closed
+            wait_policy.for_selector("sidebar close", page.get_by_role("button", name="Push To OM"))
+
+            # Click "Push to OM" and wait for the push request to complete
+            page.once("dialog", lambda dialog: dialog.accept())
+            with wait_policy.for_response("push to om", PUSH_RESPONSE_URL):
+                page.get_by_role("button", name="Push To OM").click()
+            logging.info("Pushed to OM")
+
+        # Queue items complete only once verified, so queue workers keep verification inline; API mode always uses the verifier
+        verifier = MappingVerifier(browser, context.storage_state()) if (RPA_ASYNC_VERIFY or use_api) and work_queue is None and not capture_api else None
+        if verifier is not None:
+            verifier.start()
+
+        # Verifier results go to the journal from this thread; mismatches come back as rows to re-apply
+        def record_verifications(results):
+            mismatched_rows = []
+            for row, verified, error in results:
+                if verified:
+                    journal.record(row, "verified")
+                    case_maps.setdefault(row.case, []).append(f"{row.learning_objective}\t{row.teaching_point}")
+                else:
+                    journal.record(row, "failed", error=error)
+                    # Re-read the Case Map when the row is re-applied, it may have landed after all
+                    case_maps.pop(row.case, None)
+                    mismatched_rows.append(row)
+            return mismatched_rows
+
+        # Apply one mapping row end to end, returning its journal status
+        def apply_mapping(row):
+            log_time_to_first_work("first mapping row")
+            case = row.case
+            learning_objective = row.learning_objective
+            teaching_point = row.teaching_point
+
+            logging.info(f"Processing: Case={case}, Learning Objective={learning_objective}, Teaching Point={teaching_point}")
+
+            # Rows for a case whose Case Map was already read this run can skip without navigating
+            if case in case_maps and mapping_in_case_map(case_maps[case], learning_objective, teaching_point):
+                logging.info(f"Mapping already in Case Map, skipping: Case={case}, Learning Objective={learning_objective}, Teaching Point={teaching_point}")
+                return "skipped_existing"
+
+            # Navigate to appropriate case
+            if not find_and_select_case(page, case, wait_policy):
+                raise Exception(f"Failed to locate and select case: {case}")
+
+            logging.info(f"Arrived at {case} page: {page.url}")
+            if capture_api:
+                editor_values["case_id"] = last_number(page.url)
+                editor_values["document_id"] = last_number(urllib.parse.urljoin(page.url, page.locator(".panel a.button[href*='/edit']").first.get_attribute("href") or ""))
+
+            # Hit "Editor" to enter the edit page
+            wait_policy.for_selector("editor link", ".panel a.button[href*='/edit']")
             locate_and_click(page, 
-                         "#sign_in_form > div > div > div > input[type=submit]", 
-                         """//*[@id="sign_in_form"]/div/div/div/input""", 
-                         "Submit",
-                         "input")
-        except Exception:
-            if page.url == "https://example.com":
-                logging.info("Navigation to Organization already successful")
-            else:
-                SystemExit
+                             ".panel a.button[href*='/edit']:has-text('Editor')", 
+                             """//*[@class='panel']//a[contains(@href, '/edit') and contains(text(), 'Editor')]""", 
+                             "Editor",
+                             "link")
+            # Wait for Editor to load
+            wait_policy.for_url("editor", "/versions")
+            logging.info(f"Entered editor for {case}: {page.url}")
+            if capture_api and '/versions' in page.url:
+                editor_values["version_id"] = re.search(r"/versions/(\d+)", page.url).group(1)
+                editor_values["csrf_token"] = page.evaluate("() => document.querySelector('meta[name=\"csrf-token\"]')?.content || ''")
+
+            # Retry if editor not successfully entered
+            if '/versions' not in page.url:
+                logging.warning(f"Failed to enter Editor for {case}, trying fallback to CSS Selector / XPath.")
+                try:
+                    element = page.locator(".panel a.button[href*='/edit']:has-text('Editor')")
+                    element.wait_for(state="visible", timeout=20000)
+                    element.click(timeout=20000)
+                    page.wait_for_function("() => window.location.href.includes('/versions')", timeout=20000)
+                    logging.info(f"Clicked Editor using backup CSS Selector: {page.url}")
 
-        # Iterate through rows in Google Sheet
-        for row in data:
-            try:
-                case = row["Case"]
-                learning_objective = row["Learning Objective"]
-                teaching_point = row["Teaching Point"]
+                except Exception as e:
+                    logging.error(f"Selector backup failed: {e}")
+                    try:
+                        element = page.locator("""xpath=//*[@class='panel']//a[contains(@href, '/edit') and contains(text(), 'Editor')]""")
+                        element.wait_for(state="visible", timeout=20000)
+                        element.click(timeout=20000)
+                        page.wait_for_function("() => window.location.href.includes('/versions')", timeout=20000)
+                        logging.info(f"Clicked Editor using backup Xpath: {page.url}")
 
-                logging.info(f"Processing: Case={case}, Learning Objective={learning_objective}, Teaching Point={teaching_point}")
+                    except Exception as e:
+                        logging.error(f"Xpath backup failed: {e}")
+                        raise Exception(f"Failed to enter Editor for {case}")
 
-                # Navigate to appropriate case
-                if find_and_select_case(page, case):
-                    page.wait_for_load_state("domcontentloaded", timeout=5000)
-                    page.wait_for_load_state("networkidle", timeout=5000)
-                    logging.info(f"Arrived at {case} page: {page.url}")
 
-                    # Hit "Editor" to enter the edit page
-                    page.wait_for_load_state("networkidle", timeout=10000)
-                    page.wait_for_load_state("domcontentloaded", timeout=10000)
-                    locate_and_click(page, 
-                                     ".panel a.button[href*='/edit']:has-text('Editor')", 
-                                     """//*[@class='panel']//a[contains(@href, '/edit') and contains(text(), 'Editor')]""", 
-                                     "Editor",
-                                     "link")
-                    # Wait for Editor to load
-                    page.wait_for_function("() => window.location.href.includes('/versions')", timeout=20000)
-                    page.wait_for_load_state("domcontentloaded", timeout=20000)
-                    page.wait_for_load_state("networkidle", timeout=20000)
-                    logging.info(f"Entered editor for {case}: {page.url}")
+            # Wait, then turn on Autosave feature so we don't need to click "save" at the end
+            # Due to a dev fix, autosave now correctly pops on automatically, this segment is no longer needed
+            """
+            try:
+                page.get_by_role("link", name="Auto  Off").click()
+                logging.info("Autosave initiatied")
+            except Exception as a:
+                logging.info(f"Autosave initiation failed: {a}")
+            """
+
+            # Pre-check: skip mappings the Case Map already has, reading it once per case
+            if case not in case_maps:
+                try:
+                    case_maps[case] = read_case_map(page, wait_policy)
+                except Exception as e:
+                    logging.error(f"Case Map pre-check failed for {case}, continuing with the edit: {e}")
+                    case_maps[case] = []
+            if mapping_in_case_map(case_maps[case], learning_objective, teaching_point):
+                logging.info(f"Mapping already in Case Map, skipping: Case={case}, Learning Objective={learning_objective}, Teaching Point={teaching_point}")
+                page.goto("https://example.com")
+                return "skipped_existing"
+
+            # Locate Learning Objective in Web Editor page from one snapshot of all LOs, then click it by index
+            wait_policy.for_selector("learning objectives", LEARNING_OBJECTIVE_SELECTOR)
+            learning_objectives = LearningObjectiveIndex(page)
+            learning_objective_index = learning_objectives.find(learning_objective)
+            if learning_objective_index is None:
+                raise Exception(f"Learning Objective not found in editor: {learning_objective}")
+            learning_objectives.click(learning_objective_index)
+            if capture_api:
+                editor_values["learning_objective_id"] = learning_objectives.element_id(learning_objective_index)
+            logging.info(f"Clicked Learning Objective {learning_objective_index + 1} of {len(learning_objectives.texts)}")
+
+            wait_policy.for_selector("mapping modal", ".gen-modal button")
+
+
+            # Confirm "I'm sure, let's do this" to enter Content Mapping editor
+            locate_and_click(page, 
+                             """.gen-modal .aq-button-bar.bottom-right button:has-text("I'm sure, let's do this")""", 
+                             """//*[@class='gen-modal']//div[contains(@class, 'aq-button-bar') and contains(@class, 'bottom-right')]//button[contains(text(), "I'm sure, let's do this")]""", 
+                             "I'm sure, let's do this",
+                             "button.aq-button-2")
 
-                    # Retry if editor not successfully entered
-                    if '/versions' not in page.url:
-                        logging.warning(f"Failed to enter Editor for {case}, trying fallback to CSS Selector / XPath.")
-                        try:
-                            element = page.locator(".panel a.button[href*='/edit']:has-text('Editor')")
-                            element.wait_for(state="visible", timeout=20000)
-                            element.click(timeout=20000)
-                            page.wait_for_function("() => window.location.href.includes('/versions')", timeout=20000)
-                            page.wait_for_load_state("networkidle", timeout=20000)
-                            logging.info(f"Clicked Editor using backup CSS Selector: {page.url}")
+            # Navigate into Content Mapping Tool
+            wait_policy.for_selector("content mapping tool", page.get_by_role("heading", name=" Content Mapping Tool"))
+            try:
+                page.get_by_role("heading", name=" Content Mapping Tool").locator("span").first.click()
+                logging.info("Successfully opened Content Mapping Tool")
+            except Exception as a:
+                logging.error(f"Could not open Content Mapping Tool: {a}")
 
-                        except Exception as e:
-                            logging.error(f"Selector backup failed: {e}")
-                            try:
-                                element = page.locator("""xpath=//*[@class='panel']//a[contains(@href, '/edit') and contains(text(), 'Editor')]""")
-                                element.wait_for(state="visible", timeout=20000)
-                                element.click(timeout=20000)
-                                page.wait_for_function("() => window.location.href.includes('/versions')", timeout=20000)
-                                page.wait_for_load_state("networkidle", timeout=20000)
-                                logging.info(f"Clicked Editor using backup Xpath: {page.url}")
+            # Add Row
+            wait_policy.for_selector("add row", page.get_by_role("button", name="Add Row"))
+            try:
+                page.get_by_role("button", name="Add Row").click(timeout=3000)
+                logging.info("Successfully clicked Add Row")
+            except Exception as a:
+                logging.error(f"Could not click Add Row conventionally, attempting force: {a}")
+                try:
+                    page.get_by_role("button", name="Add Row").first.click(force=True, timeout=5000)
+                except Exception as a:
+                    logging.error(f"Could not click CME Add Row using force: {a}")
 
-                            except Exception as e:
-                                logging.error(f"Xpath backup failed: {e}")
-                                SystemExit
-                    
+            # Try to make TP selection from dropdown
+            try:
+                # select combobox with full LO text
+                combobox = page.get_by_role("row", name=learning_objective).get_by_role("combobox").first
+                if not wait_policy.for_selector("tp dropdown", combobox):
+                    # Locate the correct combobox using the short LO
+                    short_learning_objective = learning_objective[:25]
+                    logging.info(f"Combobox not located with full LO text, retrying with shortened LO: {short_learning_objective}")
+                    combobox = page.get_by_role("row").filter(has_text=short_learning_objective).get_by_role("combobox").first
+                    combobox.wait_for(state="visible", timeout=5000)
+
+                # Match against the cached option table, re-reading it once if the TP is missing
+                option_value, tier = tp_option_maps[case].lookup(teaching_point) if case in tp_option_maps else (None, None)
+                if option_value is None:
+                    tp_option_maps[case] = TeachingPointOptions.from_select(combobox)
+                    option_value, tier = tp_option_maps[case].lookup(teaching_point)
+                if option_value is None:
+                    raise Exception(f"Teaching Point not found in dropdown options: {teaching_point}")
+
+                # select the 'hidden' TP with select_option
+                combobox.select_option(value=option_value)
+                editor_values["teaching_point_value"] = option_value
+                logging.info(f"Successfully selected TP in dropdown ({tier} match)")
+            except Exception as e:
+                logging.error(f"Could not select TP in dropdown: {e}")
+                raise
 
-                    # Wait, then turn on Autosave feature so we don't need to click "save" at the end
-                    # Due to a dev fix, autosave now correctly pops on automatically, this segment is no longer needed
-                    """
-                    try:
-                        page.get_by_role("link", name="Auto  Off").click()
-                        logging.info("Autosave initiatied")
-                    except Exception as a:
-                        logging.info(f"Autosave initiation failed: {a}")
-                    """
 
-                    # Locate Learning Objective in Web Editor page
+            # Click Save in CME and wait for its save request to complete
+            try:
+                with wait_policy.for_response("cme save", SAVE_RESPONSE_URL):
+                    locate_and_click(page, 
+                                 "button.aq-button:has-text('Save')", 
+                                 """//*[@class='aq-button' and contains(text(), 'Save')]""", 
+                                 "Save",
+                                 "button")
+            except Exception as e:
+                logging.info(f"Failed to click Save in Content Mapping Editor conventionally, attempting force fallback: {e}")
+                try:
+                    page.locator("button.aq-button:has-text('Save')").first.click(force=True, timeout=5000)
+                except Exception as e:
+                    logging.info(f"Failed to click CME Save using force: {e}")
 
-                    # Refined Attempt: Using Locator before BeautifulSoup to find correct LO class, click LO
+            # Click Continue - Try to force the click if it's hidden
+            wait_policy.for_selector("continue", "button.aq-button:has-text('Continue')", state="attached")
+            try:
+                page.click("button.aq-button[style='margin-right: 5px;']:has-text('Continue')", force=True)
+                logging.info("Clicked Continue button with force=True")
+            except Exception as d:
+                logging.info(f"Failed to click Continue button with force=True: {d}")
+                try:
+                    page.evaluate("""
+                        (locator) => {
+                            const element = document.querySelector(locator);
+                            element.click();
+                        }
+                    """, "button.aq-button[style='margin-right: 5px;']:has-text('Continue')")
+                    logging.info("Clicked Continue with page.evaluate")
+
+                except Exception as c:
+                    logging.info(f"Failed to click Continue with page.evaluate: {c}")
                     try:
-                        page.wait_for_load_state("networkidle")
-
-                        # attempt with full learning objective
-                        learning_objective_location = page.locator('div.learning-objective-content').filter(has_text=f"{learning_objective}")
-                        logging.info(f"Locator query for Learning Objective: {learning_objective_location}")
-                        
-                        # Resolve any duplicate matches to click on the first match
-                        learning_objective_location.first.wait_for(state="visible", timeout=5000)
-                        learning_objective_location.first.scroll_into_view_if_needed
-                        learning_objective_location.first.click()
-                        logging.info(f"Learning Objective located in full directly: {learning_objective_location}")
+                        page.locator("xpath=//button[contains(@class, 'aq-button') and contains(@style, 'margin-right') and text()='Continue']").click(force=True)
+                        logging.info("Clicked Continue with Xpath Force")
                     except Exception as e:
-                        logging.info(f"Learning Objective not located or clicked directly, fallback start. Error message: {e}; Locator info: {learning_objective_location}")
-                        try:
-                            short_learning_objective = learning_objective[:40]
-                            logging.info(f"Shortened Learning Objective to reduce errors, shortened version: {short_learning_objective}")
-                            learning_objective_location = page.locator('div.learning-objective-content').filter(has_text=f"{short_learning_objective}")
-                            logging.info(f"Locator query for Learning Objective: {learning_objective_location}")
-                            
-                            # Resolve any duplicate matches by clicking the first match
-                            learning_objective_location.first.wait_for(state="visible", timeout=5000)
-                            learning_objective_location.first.scroll_into_view_if_needed
-                            learning_objective_location.first.click()
-                            logging.info(f"Learning Objective located in full directly: {learning_objective_location}")
-                        except Exception as e:
-                            logging.info(f"Learning Objective not found as shortened version, begin BeautifulSoup fallback. Error message: {e}")
-                            try:
-                                html = page.content()
-                                soup = BeautifulSoup(html, "html.parser")
-            
-                                # Identify all potential elements
-                                elements = soup.find_all("span", string=re.compile(re.escape(learning_objective)))
+                        logging.error(f"Failed to click Continue with direct methods: {e}")
+                        locate_and_click(page, 
+                             """button.aq-button[style='margin-right: 5px;']:has-text('Continue')""", 
+                             """//button[contains(@class, 'aq-button') and contains(@style, 'margin-right') and text()='Continue']""", 
+                             "Continue",
+                             "button")
 
-                                if elements:
-                                    # Filter elements within learning-objective-content
-                                    potential_matches = [el for el in elements if 'learning-objective-content' in el.parent.get('class', [])]
-                
-                                    if potential_matches:
-                                        logging.info(f"Filtered potential matches: {[el.get_text() for el in potential_matches]}")
-
-                                        # Log elements found within the target section.
-                                        element = potential_matches[0]  # Use the first match or implement additional logic if needed
-                                        logging.info(f"Located first match: {element}")
-                                        element_xpath = f"//div[contains(@class, 'learning-objective-content')]//*[normalize-space(text())='{element.get_text()}']"
-                                        logging.info(f"Located LO element xpath: {element_xpath}")
-                                        page.locator(f"xpath={element_xpath}").scroll_into_view_if_needed()
-                                        page.locator(f"xpath={element_xpath}").click()
-                                        logging.info("LO search attempt with BeautifulSoup successful.")
-                                    else:
-                                        raise Exception("No matches found in learning-objective-content.")
-                                else:
-                                    raise Exception("Element not found using BeautifulSoup.")
-                            
-                            except Exception as soup_fallback_e:
-                                logging.error(f"Learning Objective locator with BeautifulSoup failed: {soup_fallback_e}")
-
-                    page.wait_for_load_state("networkidle")
-                    
-
-                    # Confirm "I'm sure, let's do this" to enter Content Mapping editor
-                    locate_and_click(page, 
-                                     """.gen-modal .aq-button-bar.bottom-right button:has-text("I'm sure, let's do this")""", 
-                                     """//*[@class='gen-modal']//div[contains(@class, 'aq-button-bar') and contains(@class, 'bottom-right')]//button[contains(text(), "I'm sure, let's do this")]""", 
-                                     "I'm sure, let's do this",
-                                     "button.aq-button-2")
+            # Try to click "save" prior to publish, also acts as a sleep for Autosave trigger
+            try:
+                page.locator(".edit-bar-control-bar > .gen-button.highlighted.small > a.button-name > i.fa.fa-save").first.click(timeout=1000)
+                logging.info("Clicked Save using CSS Selector")
+            except Exception as a:
+                logging.info(f"Unable to hit save with CSS Selector: {a}")
+                try:
+                    page.locator("xpath=//div[@class='edit-bar-control-bar']//div[contains(@class, 'gen-button') and contains(@class, 'highlighted') and contains(@class, 'small')]//a[@class='button-name'][i[contains(@class, 'fa') and contains(@class, 'fa-save')").first.click(timeout=1000)
+                    logging.info("Clicked Save using xpath")
+                except Exception as b:
+                    logging.info(f"Unable to click save using xpath: {b}")
+
+            # Wait for Publish button to be enabled by save / autosave triggers
+            publish_button = page.locator(".edit-bar-control-bar > .gen-button.highlighted.small > a:has-text('Publish')")
+            if wait_policy.for_selector("publish button", publish_button):
+                logging.info("Enabled Publish button visible, attempting click")
+            else:
+                logging.error("Issue waiting for main Publish button visibility")
+                wait_policy.for_selector("publish fallback", "a[href]:has-text('Publish')")
 
-                    # Navigate into Content Mapping Tool
-                    time.sleep(1)
-                    try:
-                        page.get_by_role("heading", name=" Content Mapping Tool").locator("span").first.click()
-                        logging.info("Successfully opened Content Mapping Tool")
-                    except Exception as a:
-                        logging.error(f"Could not open Content Mapping Tool: {a}")
+                locate_and_click(page, 
+                                 "a[href]:has-text('Publish')", 
+                                 "//*[@class='doc-inside-wrapper']//a[contains(text(), 'Publish')]", 
+                                 "Publish",
+                                 "link")                    
 
-                    # Add Row
-                    time.sleep(1)
-                    try:
-                        page.get_by_role("button", name="Add Row").click(timeout=3000)
-                        logging.info("Successfully clicked Add Row")
-                    except Exception as a:
-                        logging.error(f"Could not click Add Row conventionally, attempting force: {a}")
-                        try:
-                            page.get_by_role("button", name="Add Row").first.click(force=True, timeout=5000)
-                        except Exception as a:
-                            logging.error(f"Could not click CME Add Row using force: {a}")
+            # Confirm Publish once the dialog pops, and wait for the publish request
+            with wait_policy.for_response("publish confirm", PUBLISH_RESPONSE_URL):
+                try:
+                    page.get_by_role("button", name="Publish").click(timeout=wait_policy.deadline_ms("publish confirm"))
+                except Exception:
+                    logging.info("Basic Playwright method for Publish dialog box failed.")
+                    locate_and_click(page, 
+                                 "#modal-wrapper-wvppmqqhjw > div.modal-dialog > div.modal-buttons > button:nth-child(1)", 
+                                 """//*[@id='modal-wrapper-urqdwk5v9nd']/div[2]/div[3]/button[1]""", 
+                                 "Publish",
+                                 "button")
 
-                    # Try to make TP selection from dropdown
-                    time.sleep(1)
-                    try:
-                        # select combobox with full LO text
-                        combobox = page.get_by_role("row", name=learning_objective).get_by_role("combobox").first
-                        combobox.wait_for(state="visible", timeout=5000)
-                        if combobox.is_visible():
-                            combobox.click()
-                            tp = page.locator("option", has_text=teaching_point)
-                            logging.info(f"Full LO, Full TP:  Locator results for TP matches in dropdown: {tp}")
-                            # select the 'hidden' TP with select_option
-                            option_value = tp.first.get_attribute("value")
-                            combobox.select_option(value=option_value)
-                            logging.info("Successfully selected TP in dropdown")
-                    except Exception as e:
-                        logging.error(f"Could not locate combobox using full LO text: {e}")
-                        try: # Locate the correct combobox using the short LO
-                            short_learning_objective = learning_objective[:25]
-                            short_teaching_point = teaching_point[:20]
-                            combobox = None
-                            # Locate combobox with shortened text
-                            combobox = page.get_by_role("row").filter(has_text=short_learning_objective).get_by_role("combobox").first
-                            combobox.wait_for(state="visible", timeout=5000)
-                            if combobox.is_visible():
-                                combobox.click()
-                                tp = page.locator("option", has_text=short_teaching_point)
-                                logging.info(f"Short LO, Short TP: Locator results for TP matches in dropdown: {tp}")
-                                # select the 'hidden' TP with select_option
-                                option_value = tp.first.get_attribute("value")
-                                combobox.select_option(value=option_value)
-                                logging.info("Successfully selected TP in dropdown")
-                        except Exception as e:
-                            logging.error(f"Combobox not located with shortened LO: {e}")
-                            raise SystemExit
+            # Accept the page reload dialog that follows the banner prompt
+            page.once("dialog", lambda dialog: dialog.accept())
 
-                    
-                    # Click Save in CME
-                    time.sleep(1)
-                    try:
-                        locate_and_click(page, 
-                                     "button.aq-button:has-text('Save')", 
-                                     """//*[@class='aq-button' and contains(text(), 'Save')]""", 
-                                     "Save",
-                                     "button")
-                    except Exception as e:
-                        logging.info(f"Failed to click Save in Content Mapping Editor conventionally, attempting force fallback: {e}")
-                        try:
-                            page.locator("button.aq-button:has-text('Save')").first.click(force=True, timeout=5000)
-                        except Exception as e:
-                            logging.info(f"Failed to click CME Save using force: {e}")
+            # Click Cancel on updating Banner once it pops, then wait for the page to reload
+            wait_policy.for_selector("cancel banner", page.get_by_role("button", name="Cancel"))
+            with wait_policy.for_navigation("publish reload"):
+                try:
+                    page.get_by_role("button", name="Cancel").click()
+                except Exception:
+                    logging.info("Basic Playwright method for Cancel banner update failed.")
+                    locate_and_click(page, 
+                                 "button.modal-button.gen-button.highlighted.small", 
+                                 """//*[@id='modal-wrapper-c7c78lnq75u']/div[2]/div[3]/button[2]""", 
+                                 "Cancel",
+                                 "button")
+
+            # If dialog box on publishing still exists, use keyboard escape to remove it
+            # page.keyboard.press("Escape")
+            journal.record(row, "applied")
+
+            # With the verifier running, Push to OM right away and let it check the Case Map in the background
+            if verifier is not None:
+                push_to_om()
+                logging.info(f"Published, queued for verification: Case={case}, Learning Objective={learning_objective}, Teaching Point={teaching_point}")
+                page.goto("https://example.com")
+                return "applied"
+
+            # Attempt to verify that we have made Content Mapping changes successfully
+            try:
+                # Click into Case Map
+                page.get_by_role("link", name="CASE MAP").click()
+                page.locator("input[name=\"learning_objective\"]").click()
+
+                # Enter LO in the filter input
+                page.locator("input[name=\"learning_objective\"]").fill(learning_objective)
+                page.keyboard.press("Enter")
+                wait_policy.for_selector("case map filter", ".reasoning-tool-panel .fixed-height-table table tbody td")
+
+                # Verify the table contains the entered learning objective and teaching point
+                logging.info(f"Attempting verification of mapping changes")
+                if verify_learning_objective_in_table(page, learning_objective, teaching_point):
+                    logging.info("Verification successful.")
+                    case_maps[case].append((normalize_label(learning_objective), normalize_label(teaching_point)))
+                else:
+                    logging.error("Verification failed.")
+                    raise Exception("Mapping not found in Case Map after publish")
 
-                    # Click Continue - Try to force the click if it's hidden
-                    time.sleep(1)
-                    try:
-                        page.click("button.aq-button[style='margin-right: 5px;']:has-text('Continue')", force=True)
-                        logging.info("Clicked Continue button with force=True")
-                    except Exception as d:
-                        logging.info(f"Failed to click Continue button with force=True: {d}")
+            except Exception as e:
+                logging.error(f"Error during verification steps: {e}")
+                raise
+
+
+            # Close the Sidebar Nav by clicking Case Map
+            page.get_by_role("link", name="CASE MAP").click()
+            push_to_om()
+
+            # Wait for redirect to Projects
+            # page.wait_for_url("INSERT PROJECTS URL", timeout=30000)
+
+            # Log success
+            logging.info(f"Successfully updated: Case={case}, Learning Objective={learning_objective}, Teaching Point={teaching_point}")
+
+            # Return to main page to restart loop
+            page.goto("https://example.com")
+            return "verified"
+
+        # Queue workers take whole cases from the work queue; retries are the queue's attempts instead of the loop below
+        if work_queue is not None:
+            while True:
+                item = work_queue.lease("rpa_cases", owner)
+                if item is None:
+                    if work_queue.outstanding(("rpa_cases",)) == 0:
+                        break
+                    time.sleep(2)
+                    continue
+                # Another worker may have edited the case since this one last cached it
+                case_maps.pop(item.key, None)
+                tp_option_maps.pop(item.key, None)
+                stop_heartbeat = threading.Event()
+                threading.Thread(target=keep_lease, args=(work_queue.path, item, owner, stop_heartbeat), daemon=True).start()
+                failed_rows = []
+                try:
+                    # Rows done on an earlier attempt of this case are skipped
+                    for row in (MappingRow(*payload) for payload in item.payload):
+                        if journal.done(row):
+                            continue
                         try:
-                            page.evaluate("""
-                                (locator) => {
-                                    const element = document.querySelector(locator);
-                                    element.click();
-                                }
-                            """, "button.aq-button[style='margin-right: 5px;']:has-text('Continue')")
-                            logging.info("Clicked Continue with page.evaluate")
-
-                        except Exception as c:
-                            logging.info(f"Failed to click Continue with page.evaluate: {c}")
+                            start = time.perf_counter()
+                            status = apply_mapping(row)
+                            journal.record(row, status, seconds=time.perf_counter() - start)
+                        except Exception as e:
+                            logging.error(f"Error processing row: {row} (attempt {item.attempts}), Error: {e}")
+                            journal.record(row, "failed", error=str(e))
+                            failed_rows.append(row.row)
                             try:
-                                page.locator("xpath=//button[contains(@class, 'aq-button') and contains(@style, 'margin-right') and text()='Continue']").click(force=True)
-                                logging.info("Clicked Continue with Xpath Force")
+                                page.goto("https://example.com")
                             except Exception as e:
-                                logging.error(f"Failed to click Continue with direct methods: {e}")
-                                locate_and_click(page, 
-                                     """button.aq-button[style='margin-right: 5px;']:has-text('Continue')""", 
-                                     """//button[contains(@class, 'aq-button') and contains(@style, 'margin-right') and text()='Continue']""", 
-                                     "Continue",
-                                     "button")
-
-                    # Try to click "save" prior to publish, also acts as a sleep for Autosave trigger
-                    try:
-                        page.locator(".edit-bar-control-bar > .gen-button.highlighted.small > a.button-name > i.fa.fa-save").first.click(timeout=1000)
-                        logging.info("Clicked Save using CSS Selector")
-                    except Exception as a:
-                        logging.info(f"Unable to hit save with CSS Selector: {a}")
-                        try:
-                            page.locator("xpath=//div[@class='edit-bar-control-bar']//div[contains(@class, 'gen-button') and contains(@class, 'highlighted') and contains(@class, 'small')]//a[@class='button-name'][i[contains(@class, 'fa') and contains(@class, 'fa-save')").first.click(timeout=1000)
-                            logging.info("Clicked Save using xpath")
-                        except Exception as b:
-                            logging.info(f"Unable to click save using xpath: {b}")
-
-                    time.sleep(1)
-                    # Wait for Publish button to be enabled by save / autosave triggers
-                    try:
-                        publish_button = page.locator(".edit-bar-control-bar > .gen-button.highlighted.small > a:has-text('Publish')")
-                        publish_button.wait_for(state="visible", timeout=30000)
-                        logging.info("Enabled Publish button visible, attempting click")
-                    except Exception as e:
-                        logging.error(f"Issue waiting for main Publish button visibility: {e}")
-                        time.sleep(10)
-                        
-                        locate_and_click(page, 
-                                         "a[href]:has-text('Publish')", 
-                                         "//*[@class='doc-inside-wrapper']//a[contains(text(), 'Publish')]", 
-                                         "Publish",
-                                         "link")                    
-
-                    # Confirm Publish, sleep for dialog boxes to pop
-                    time.sleep(1)
-                    try:
-                        page.get_by_role("button", name="Publish").click()
-                    except Exception:
-                        logging.info("Basic Playwright method for Publish dialog box failed.")
-                        locate_and_click(page, 
-                                     "#modal-wrapper-wvppmqqhjw > div.modal-dialog > div.modal-buttons > button:nth-child(1)", 
-                                     """//*[@id='modal-wrapper-urqdwk5v9nd']/div[2]/div[3]/button[1]""", 
-                                     "Publish",
-                                     "button")
-
-                    # Click Cancel on updating Banner, sleep for dialog boxes to pop
-                    time.sleep(1)
+                                logging.error(f"Failed to return to main page: {e}")
+                    if failed_rows:
+                        work_queue.fail(item, owner, f"rows {failed_rows} failed")
+                    else:
+                        work_queue.complete(item, owner)
+                finally:
+                    stop_heartbeat.set()
+            close_browser()
+            return
+
+        # Skip rows the journal already has as done, so a rerun only costs the remaining work
+        pending = [row for row in data if not journal.done(row)]
+        logging.info(f"Journal: {len(data) - len(pending)} rows already done, {len(pending)} to process")
+
+        deadline = None if budget_seconds is None else time.monotonic() + budget_seconds
+
+        # Capture: apply pending rows through the UI until one is published, recording the editor's write calls
+        if capture_api:
+            captured = []
+
+            def record_request(request):
+                if request.resource_type in ("xhr", "fetch") and request.method in WRITE_METHODS:
+                    captured.append({
+                        "method": request.method, "url": request.url, "data": request.post_data,
+                        "headers": {name: value for name, value in request.headers.items() if name.lower() in EDITOR_API_HEADERS},
+                    })
+
+            for row in pending:
+                captured.clear()
+                context.on("request", record_request)
+                try:
+                    status = apply_mapping(row)
+                finally:
+                    context.remove_listener("request", record_request)
+                journal.record(row, status)
+                if status == "verified":
+                    editor_values.update(learning_objective=row.learning_objective, teaching_point=row.teaching_point)
+                    template = build_editor_api_template(captured, editor_values)
+                    with open(EDITOR_API_TEMPLATE_FILE, "w", encoding="utf-8") as f:
+                        json.dump(template, f, indent=2)
+                    logging.info(f"Captured {len(captured)} editor calls from row {row.row} into {EDITOR_API_TEMPLATE_FILE}")
+                    print(f"Captured {len(captured)} editor calls into {EDITOR_API_TEMPLATE_FILE}")
                     try:
-                        page.get_by_role("button", name="Cancel").click()
-                    except Exception:
-                        logging.info("Basic Playwright method for Cancel banner update failed.")
-                        locate_and_click(page, 
-                                     "button.modal-button.gen-button.highlighted.small", 
-                                     """//*[@id='modal-wrapper-c7c78lnq75u']/div[2]/div[3]/button[2]""", 
-                                     "Cancel",
-                                     "button")
-
-                    # Wait for page reload dialog, accept and reload
-                    page.once("dialog", lambda dialog: dialog.accept())
-
-                    # Wait for page to reload, then check for the change
-                    time.sleep(5)
-
-                    # If dialog box on publishing still exists, use keyboard escape to remove it
-                    # page.keyboard.press("Escape")
-                    page.wait_for_load_state("networkidle", timeout=20000)
-                    # Attempt to verify that we have made Content Mapping changes successfully
+                        check_editor_api_template(template)
+                    except ValueError as e:
+                        print(f"--api will refuse this template until it is reviewed: {e}")
+                    break
+            close_browser()
+            return
+
+        # API mode: replay the captured calls per case; cases that fail fall through to the UI loop below.
+        # Only rows with no journal history go this way, since the API path has no Case Map pre-check.
+        editor_api = None
+        if use_api:
+            try:
+                editor_api = EditorApi.load(context)
+            except Exception as e:
+                logging.error(f"Editor API template {EDITOR_API_TEMPLATE_FILE} unusable, applying every row through the UI: {e}")
+        if editor_api is not None:
+            rows_by_case = collections.defaultdict(list)
+            for row in pending:
+                if journal.status(row) is None:
+                    rows_by_case[row.case].append(row)
+            replayed_rows = set()
+            for case, rows in rows_by_case.items():
+                if deadline is not None and time.monotonic() > deadline:
+                    logging.info("Budget reached during editor API replay, remaining rows are left for the next run")
+                    break
+                verifier.advance(case)
+                try:
+                    start = time.perf_counter()
+                    editor_api.apply_case(case, rows)
+                except Exception as e:
+                    logging.error(f"Editor API failed for {case}, falling back to the UI: {e}")
+                    continue
+                for row in rows:
+                    verifier.submit(row)
+                    journal.record(row, "verifying", seconds=(time.perf_counter() - start) / len(rows))
+                replayed_rows.update(rows)
+            pending = [row for row in pending if row not in replayed_rows]
+            logging.info(f"Editor API applied {len(replayed_rows)} rows, {len(pending)} left for the UI")
+
+        # With a budget every row is worth the same, so the quickest predicted rows go first, kept together by case
+        if deadline is not None:
+            pending.sort(key=lambda row: (journal.predicted_seconds(row), row.case))
+            logging.info(f"Budget of {budget_seconds / 60:.0f} min: about {sum(journal.predicted_seconds(row) for row in pending) / 60:.0f} min of rows pending")
+        out_of_time = False
+
+        # Failed rows go to a retry list instead of aborting the run
+        retry_rows = []
+        for attempt in range(RPA_MAX_ATTEMPTS):
+            retry_rows = []
+            for row in pending:
+                # Stop cleanly before a row predicted to overrun; the journal has everything done so far
+                if deadline is not None and time.monotonic() + journal.predicted_seconds(row) > deadline:
+                    logging.info(f"Budget reached before row {row.row}, remaining rows are left for the next run")
+                    out_of_time = True
+                    break
+                if verifier is not None:
+                    verifier.advance(row.case)
+                try:
+                    start = time.perf_counter()
+                    status = apply_mapping(row)
+                    if status == "applied":
+                        verifier.submit(row)
+                        status = "verifying"
+                    journal.record(row, status, seconds=time.perf_counter() - start)
+                except Exception as e:
+                    logging.error(f"Error processing row: {row}, Error: {e}")
+                    journal.record(row, "failed", error=str(e))
+                    retry_rows.append(row)
+                    # Return to the main page so the next row starts from a clean state
                     try:
-                        # Click into Case Map
-                        page.get_by_role("link", name="CASE MAP").click()
-                        page.locator("input[name=\"learning_objective\"]").click()
-
-                        # Enter LO in the filter input
-                        page.locator("input[name=\"learning_objective\"]").fill(learning_objective)
-                        page.keyboard.press("Enter")
-                        time.sleep(2)
-
-                        # Verify the table contains the entered learning objective and teaching point
-                        logging.info(f"Attempting verification of mapping changes")
-                        if verify_learning_objective_in_table(page, learning_objective, teaching_point):
-                            logging.info("Verification successful.")
-                        else:
-                            logging.error("Verification failed.")
-                            context.close()
-                            browser.close()
-                            raise SystemExit
-    
+                        page.goto("https://example.com")
                     except Exception as e:
-                        logging.error(f"Error during verification steps: {e}")
-                        context.close()
-                        browser.close()
-                        raise SystemExit
-
-
-                    # Close the Sidebar Nav by clicking Case Map
-                    page.get_by_role("link", name="CASE MAP").click()
-                    
-                    # Ensure that sidebar closes
-                    time.sleep(1)
-
-                    # Click "Push to OM"
-                    page.once("dialog", lambda dialog: dialog.accept())
-                    page.get_by_role("button", name="Push To OM").click()
-                    logging.info("Pushed to OM")
-                    time.sleep(5)
-
-                    # Wait for redirect to Projects
-                    # page.wait_for_url("INSERT PROJECTS URL", timeout=30000)
-
-                    # Log success
-                    logging.info(f"Successfully updated: Case={case}, Learning Objective={learning_objective}, Teaching Point={teaching_point}")
-
-                    # Return to main page to restart loop
-                    page.goto("https://example.com")
-
-                else:
-                    logging.error(f"Failed to locate and select case: {case}")
-                    context.close()
-                    browser.close()
-                    raise SystemExit
-
-            except Exception as e:
-                logging.error(f"Error processing row: {row}, Error: {e}")
-                context.close()
-                browser.close()
-                raise SystemExit
-
-        context.close()
-        browser.close()
+                        logging.error(f"Failed to return to main page: {e}")
+                if verifier is not None:
+                    retry_rows.extend(record_verifications(verifier.drain()))
+            # Mismatches found by the verifier are re-applied with this attempt's failures
+            if verifier is not None:
+                retry_rows.extend(record_verifications(verifier.wait()))
+            if not retry_rows or out_of_time:
+                break
+            logging.info(f"Attempt {attempt + 1}: {len(retry_rows)} rows failed, queued for retry")
+            pending = retry_rows
+
+        if retry_rows and not out_of_time:
+            logging.error(f"{len(retry_rows)} rows still failing after {RPA_MAX_ATTEMPTS} attempts: {[row.row for row in retry_rows]}")
+
+        if verifier is not None:
+            verifier.close()
+        close_browser()
 
     except Exception as e:
         logging.error(f"An error occurred: {e}")
-
-with sync_playwright() as playwright:
-    run(playwright)
+        # A failed login hands the shared login to the next worker now instead of when its lease expires
+        if auth_item is not None:
+            work_queue.fail(auth_item, owner, str(e))
+
+def dry_run(data):
+    # Report what a run would do from the sheet and journal, without a browser
+    log_time_to_first_work("dry run sheet read")
+    journal = RunJournal()
+    pending = [row for row in data if not journal.done(row)]
+    print(f"{len(data)} rows, {len(data) - len(pending)} already done in {journal.path}, {len(pending)} to process")
+    unknown_repositories = sorted({row.case.strip().split()[0] for row in pending if row.case.strip() and row.case.strip().split()[0] not in repositories})
+    if unknown_repositories:
+        print(f"No repository URL for: {', '.join(unknown_repositories)}")
+
+
+def worker_process(worker_id):
+    # Spawned processes start without the parent's log listener, so each writes its own log
+    setup_logging(f"mapping_log-worker{worker_id}.log")
+    work_queue = WorkQueue()
+    try:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as playwright:
+            run(playwright, [], work_queue, f"{socket.gethostname()}:{os.getpid()}")
+    finally:
+        work_queue.close()
+
+def run_workers(processes):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=worker_process, args=(worker_id,)) for worker_id in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    work_queue = WorkQueue()
+    try:
+        remove_storage_state(work_queue)
+    finally:
+        work_queue.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Apply Learning Objective to Teaching Point mappings from the Source sheet in the content editor.")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    run_parser = subparsers.add_parser("run", help="apply the pending mappings (default)")
+    run_parser.add_argument("--dry-run", action="store_true",
+                            help="read the sheet and journal and report what would run, without a browser")
+    run_parser.add_argument("--budget", type=float, metavar="MINUTES",
+                            help="stop before this many minutes, doing the quickest predicted rows first")
+    run_parser.add_argument("--api", action="store_true",
+                            help=f"apply new mappings through the editor calls captured in {EDITOR_API_TEMPLATE_FILE}, with the UI as fallback")
+    run_parser.add_argument("--capture-api", action="store_true",
+                            help=f"apply the first pending mapping through the UI and record the editor's calls to {EDITOR_API_TEMPLATE_FILE}")
+    subparsers.add_parser("enqueue", help="queue the pending mapping rows for the queue workers, one item per case")
+    worker_parser = subparsers.add_parser("worker", help="apply queued mapping rows, one case at a time per worker")
+    worker_parser.add_argument("--processes", type=int, default=WORKER_PROCESSES, help="worker processes, each with its own browser (default: %(default)s)")
+    subparsers.add_parser("queue-status", help="count work items by queue and status")
+    return parser
+
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging('mapping_log.log')
+
+    if args.command == "worker":
+        run_workers(args.processes)
+        return 0
+    if args.command == "queue-status":
+        work_queue = WorkQueue()
+        try:
+            for queue_name, status, count in work_queue.counts():
+                print(f"{queue_name:10} {status:8} {count}")
+        finally:
+            work_queue.close()
+        return 0
+
+    data = load_mapping_rows()
+    if args.command == "enqueue":
+        work_queue = WorkQueue()
+        try:
+            print(f"Queued {enqueue_rows(work_queue, data)} mapping rows")
+        finally:
+            work_queue.close()
+        return 0
+    if getattr(args, "dry_run", False):
+        dry_run(data)
+        return 0
+
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as playwright:
+        run(playwright, data, budget_seconds=args.budget * 60 if getattr(args, "budget", None) else None,
+            use_api=getattr(args, "api", False), capture_api=getattr(args, "capture_api", False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(cli())
@@ -1,49 +1,219 @@
+import time
+# Process start, for measuring time to first useful work
+PROCESS_START = time.perf_counter()
+
 import re
 import pickle
+import sqlite3
+import hashlib
+import csv
+import datetime
 import os
-import gspread
+import json
+import glob
+import tempfile
+import argparse
 import logging
-from oauth2client.service_account import ServiceAccountCredentials
-from playwright.async_api import async_playwright, TimeoutError, Page
-from dotenv import load_dotenv, find_dotenv
-from bs4 import BeautifulSoup
-import time
+import logging.handlers
+import queue
 import asyncio
-
-
-# Setup Pickle Save and Load States
+import random
+import statistics
+import socket
+import threading
+import sys
+import multiprocessing
+import contextlib
+import tracemalloc
+import urllib.request
+import http.server
+import collections
+import itertools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Logging, the quota-aware Google Sheets client and the work queue are shared with the RPA script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import automation_common.work_queue
+from automation_common.logs import LOG_SAMPLED, payload_logger, setup_logging, forward_worker_logs, log_to_queue
+from automation_common.sheets import SheetsClient
+
+
+# Pickle checkpoint from older runs, imported into the scrape store on first use
 CHECKPOINT_FILE = 'scrape-cd.pkl'
 
-def save_state(state):
-    with open(CHECKPOINT_FILE, 'wb') as f:
-        pickle.dump(state, f)
-
 def load_state():
     if os.path.exists(CHECKPOINT_FILE):
         with open(CHECKPOINT_FILE, 'rb') as f:
             return pickle.load(f)
     return None
 
-# Configure logging
-logging.basicConfig(filename='scrape_cd.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# locate .env
-dotenv_path = find_dotenv()
-if not dotenv_path:
-    raise FileNotFoundError(".env file not found.")
-load_dotenv(dotenv_path)
-
-# Environment Variables for Org
-Org_UN = os.environ.get('Org_User_ID')
-Org_PW = os.environ.get('Org_Password')
-
-# Ensure Org_UN and Org_PW are obtained
-if not Org_UN or not Org_PW:
-    raise ValueError("Org_User_ID or Org_Password environment variables are not set.")
-
-# Log for debugging values
-logging.info(f"Org_UN={Org_UN}")
-logging.info(f"Org_PW={'*' * len(Org_PW)}")  # Masks the password for privacy
+# Scrape store: raw case scrapes and their parse results in SQLite, shared by the scrape / parse / write stages
+SCRAPE_STORE_FILE = os.environ.get("SCRAPE_STORE_FILE", "scrape-cd.sqlite3")
+SCRAPE_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS case_scrapes (
+    case_name TEXT PRIMARY KEY,
+    course TEXT,
+    course_url TEXT,
+    html_content TEXT,
+    text_content TEXT,
+    scraped_at REAL
+);
+CREATE TABLE IF NOT EXISTS case_synopses (
+    case_name TEXT PRIMARY KEY,
+    synopsis TEXT,
+    parsed_at REAL
+);
+CREATE TABLE IF NOT EXISTS teaching_points (
+    case_name TEXT,
+    title TEXT,
+    full_text TEXT,
+    parsed_at REAL,
+    PRIMARY KEY (case_name, title)
+);
+CREATE TABLE IF NOT EXISTS scrape_latency (
+    case_name TEXT PRIMARY KEY,
+    seconds REAL,
+    runs INTEGER
+);
+"""
+
+
+class ScrapeStore:
+    def __init__(self, path=SCRAPE_STORE_FILE):
+        self.path = path
+        # Several worker processes may write at once, so wait on the lock instead of failing
+        self.connection = sqlite3.connect(path, timeout=30)
+        # WAL lets the parse workers read while the scrape stage keeps writing
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCRAPE_STORE_SCHEMA)
+        self.import_checkpoint()
+
+    def import_checkpoint(self):
+        # One-time migration of the pickled checkpoint into an empty store
+        if self.scraped_case_names() or not os.path.exists(CHECKPOINT_FILE):
+            return
+        state = load_state()
+        with self.connection:
+            for case_name, scrape in state['case_scrapes'].items():
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO case_scrapes (case_name, html_content, text_content, scraped_at) VALUES (?, ?, ?, ?)",
+                    (case_name, scrape["html_content"], scrape["text_content"], os.path.getmtime(CHECKPOINT_FILE))
+                )
+        logging.info(f"Imported {len(state['case_scrapes'])} case scrapes from {CHECKPOINT_FILE} into {self.path}")
+
+    def save_scrape(self, case_name, course, course_url, html_content, text_content):
+        # Committed per case, so an interrupted scrape keeps everything finished so far
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO case_scrapes VALUES (?, ?, ?, ?, ?, ?)",
+                (case_name, course, course_url, html_content, text_content, time.time())
+            )
+
+    def record_latency(self, case_name, seconds):
+        # Moving average of each case's scrape time, for the deadline scheduler's predictions
+        with self.connection:
+            self.connection.execute(
+                """INSERT INTO scrape_latency VALUES (?, ?, 1)
+                   ON CONFLICT(case_name) DO UPDATE SET seconds = 0.5 * seconds + 0.5 * excluded.seconds, runs = runs + 1""",
+                (case_name, seconds)
+            )
+
+    def scrape_latencies(self):
+        return dict(self.connection.execute("SELECT case_name, seconds FROM scrape_latency"))
+
+    def scraped_case_names(self):
+        return {case_name for (case_name,) in self.connection.execute("SELECT case_name FROM case_scrapes")}
+
+    def iter_scrapes(self, column):
+        # Stream one content column without loading every scrape into memory
+        if column not in ("html_content", "text_content"):
+            raise ValueError(f"Unknown scrape column: {column}")
+        yield from self.connection.execute(f"SELECT case_name, {column} FROM case_scrapes ORDER BY case_name")
+
+    def save_parses(self, results):
+        # Replace every parse result for the given cases in a single transaction
+        parsed_at = time.time()
+        with self.connection:
+            for case_name, synopsis, teaching_points in results:
+                self.connection.execute("DELETE FROM teaching_points WHERE case_name = ?", (case_name,))
+                self.connection.execute("INSERT OR REPLACE INTO case_synopses VALUES (?, ?, ?)", (case_name, synopsis, parsed_at))
+                self.connection.executemany(
+                    "INSERT INTO teaching_points VALUES (?, ?, ?, ?)",
+                    [(case_name, title, full_text, parsed_at) for title, full_text in teaching_points.items()]
+                )
+
+    def get_synopsis(self, case_name):
+        row = self.connection.execute("SELECT synopsis FROM case_synopses WHERE case_name = ?", (case_name,)).fetchone()
+        return row[0] if row else None
+
+    def get_teaching_points(self, case_name):
+        return dict(self.connection.execute("SELECT title, full_text FROM teaching_points WHERE case_name = ? ORDER BY rowid", (case_name,)))
+
+    def teaching_points_by_case(self):
+        teaching_points = collections.defaultdict(list)
+        for case_name, title, full_text in self.connection.execute("SELECT case_name, title, full_text FROM teaching_points ORDER BY case_name, rowid"):
+            teaching_points[case_name].append({"title": title, "full_text": full_text})
+        return teaching_points
+
+    def iter_cases(self):
+        # One row per scraped case with its synopsis, streamed so the raw HTML is never all in memory
+        yield from self.connection.execute("""
+            SELECT s.case_name, s.course, s.course_url, s.html_content, s.text_content, s.scraped_at, p.synopsis, p.parsed_at
+            FROM case_scrapes s LEFT JOIN case_synopses p ON p.case_name = s.case_name
+            ORDER BY s.case_name
+        """)
+
+    def close(self):
+        self.connection.close()
+
+
+# Work queue: leased work items in SQLite (automation_common/work_queue.py) so several worker processes on this host can share one plan
+WORK_QUEUE_FILE = os.environ.get("WORK_QUEUE_FILE", "work-queue.sqlite3")
+WORK_LEASE_SECONDS = int(os.environ.get("WORK_LEASE_SECONDS", 300))
+WORK_MAX_ATTEMPTS = int(os.environ.get("WORK_MAX_ATTEMPTS", 3))
+
+
+class WorkQueue(automation_common.work_queue.WorkQueue):
+    def __init__(self, path=WORK_QUEUE_FILE, lease_seconds=WORK_LEASE_SECONDS, max_attempts=WORK_MAX_ATTEMPTS):
+        super().__init__(path, lease_seconds, max_attempts)
+
+
+first_work_logged = False
+
+def log_time_to_first_work(step):
+    # Logged once per process, from interpreter start to the first step doing real work
+    global first_work_logged
+    if not first_work_logged:
+        first_work_logged = True
+        logging.info(f"Time to first useful work ({step}): {time.perf_counter() - PROCESS_START:.2f}s")
+
+# Org credentials are read from .env only by the subcommands that sign in
+def load_org_credentials():
+    from dotenv import load_dotenv, find_dotenv
+
+    # locate .env, falling back to the process environment
+    dotenv_path = find_dotenv()
+    if dotenv_path:
+        load_dotenv(dotenv_path)
+    else:
+        logging.warning(".env file not found, using the process environment.")
+
+    # Environment Variables for Org
+    Org_UN = os.environ.get('Org_User_ID')
+    Org_PW = os.environ.get('Org_Password')
+
+    # Ensure Org_UN and Org_PW are obtained
+    if not Org_UN or not Org_PW:
+        raise ValueError("Org_User_ID or Org_Password environment variables are not set.")
+
+    # Log for debugging values
+    logging.info(f"Org_UN={Org_UN}")
+    logging.info(f"Org_PW={'*' * len(Org_PW)}")  # Masks the password for privacy
+    return Org_UN, Org_PW
+
+# Org site the scraper signs into
+BASE_URL = "https://placeholder.org.com"
 
 # Create a dictionary to store course names and urls for case listings by course
 courses = {
@@ -65,84 +235,767 @@ courses = {
     "Addiction": "https://placeholder.org.com/document_sets/4898"
 }
 
+# Lightweight row tuple for the sheet columns the coordinator actually needs
+CourseRow = namedtuple("CourseRow", ["row", "course", "case_name", "teaching_point"])
+
+# Maximum number of ranges sent in a single values batch_update request
+WRITE_BATCH_SIZE = 100
+
+# Normalize a cell value so formatting-only differences don't trigger a rewrite
+def normalize_cell_value(value):
+    text = str(value).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+# Group sorted row numbers into (start_row, end_row) runs of consecutive rows
+def contiguous_row_runs(rows):
+    runs = []
+    for row in rows:
+        if runs and row == runs[-1][1] + 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+    return [tuple(run) for run in runs]
+
+
 class GoogleSheetHandler:
     def __init__(self, spreadsheet_id, credentials):
         self.spreadsheet_id = spreadsheet_id
         self.credentials = credentials
-        self.client = self.authenticate()
-        self.sheet = self.client.open("Curriculum_Dashboard").worksheet("All_Data")
-
-    def authenticate(self):
-        scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_name(self.credentials, scope)
-        return gspread.authorize(creds)
-
-    def read_all_records(self):
-        return self.sheet.get_all_records()
+        self.sheets_client = SheetsClient.shared(credentials)
+        self.client = self.sheets_client.client
+        self.sheet = self.sheets_client.open_worksheet("Curriculum_Dashboard", "All_Data")
+        self.header_positions = None
+
+    def resolve_header_positions(self, headers):
+        # Read the header row once, then reuse the column positions for every ranged read
+        if self.header_positions is None:
+            header_row = self.sheets_client.call(self.sheet.row_values, 1)
+            self.header_positions = {name.strip(): idx + 1 for idx, name in enumerate(header_row) if name}
+            logging.info(f"Resolved {len(self.header_positions)} header positions in All_Data")
+
+        missing_headers = [header for header in headers if header not in self.header_positions]
+        if missing_headers:
+            raise ValueError(f"Headers not found in All_Data: {missing_headers}")
+
+        # Convert the column numbers into A1 column letters (e.g. 3 -> "C")
+        from gspread.utils import rowcol_to_a1
+        return [rowcol_to_a1(1, self.header_positions[header])[:-1] for header in headers]
+
+    def iter_columns(self, headers):
+        # Fetch only the requested columns in one batch_get instead of every column in the sheet
+        return self.iter_column_letters(self.resolve_header_positions(headers))
+
+    def iter_column_letters(self, column_letters):
+        ranges = [f"{letter}2:{letter}" for letter in column_letters]
+        value_ranges = self.sheets_client.call(self.sheet.batch_get, ranges, major_dimension="COLUMNS")
+        columns = [value_range[0] if value_range else [] for value_range in value_ranges]
+
+        # Trailing blank cells are trimmed by the API, so pad shorter columns with empty strings
+        row_count = max((len(column) for column in columns), default=0)
+        for offset in range(row_count):
+            values = tuple(column[offset] if offset < len(column) else "" for column in columns)
+            yield (offset + 2,) + values  # +2 for the header row and Google Sheets 1-based index
 
     def extract_course_data(self):
-        data = self.read_all_records()
         course_data = []
-        for row in data:
-            if "Course" in row and "Case" in row:  # Ensure both fields are present
-                course_name_full = row["Course"].strip()
-                course_name_first_word = course_name_full.split()[0] if course_name_full else ""
-               
-                course_data.append({
-                    "Course": course_name_first_word,
-                    "Case Name": row["Case"].strip(),
-                    "Teaching Point": row["Teaching Point"].strip()
-                })
+        headers = ["Course", "Case", "Teaching Point"]
+        for row, course, case_name, teaching_point in self.sheets_client.read_cached_rows(self.sheet, headers, lambda: self.iter_columns(headers)):
+            course_name_full = course.strip()
+            course_name_first_word = course_name_full.split()[0] if course_name_full else ""
+
+            course_data.append(CourseRow(row, course_name_first_word, case_name.strip(), teaching_point.strip()))
         return course_data
 
+    def read_written_cells(self):
+        # Current EK (synopsis) and EL (full text) cells by row, for the deadline scheduler's case values
+        rows = self.sheets_client.read_cached_rows(self.sheet, ["EK", "EL"], lambda: self.iter_column_letters(["EK", "EL"]))
+        return {row: (synopsis, full_text) for row, synopsis, full_text in rows}
+
     def write_column(self, column: str, data: list):
+        write_counts = {"written": 0, "unchanged": 0, "skipped": 0}
         try:
-            # Check the sheet size to verify whether enough columns for our writing task
-            sheet_properties = self.sheet.spreadsheet.fetch_sheet_metadata()
-            current_columns = sheet_properties['sheets'][0]['properties']['gridProperties']['columnCount']
-            required_columns = gspread.utils.a1_to_rowcol(f"{column}1")[1]
+            # Check the sheet size to verify whether enough columns for our writing task (metadata is cached)
+            current_columns = self.sheets_client.get_column_count(self.sheet)
+            from gspread.utils import a1_to_rowcol
+            required_columns = a1_to_rowcol(f"{column}1")[1]
 
             # Expand the grid if necessary
             if current_columns < required_columns:
-                self.sheet.add_cols(required_columns - current_columns)
+                self.sheets_client.add_cols(self.sheet, required_columns - current_columns)
                 logging.info(f"Expanded the sheet to {required_columns} columns.")
 
-            # Iterate through the data
-            for idx, entry in enumerate(data):
+            # Collect the new value for each row, skipping entries without a row or a value
+            value_key = 'Case Synopsis' if column == 'EK' else 'Full Text'
+            new_values = {}
+            for entry in data:
                 row = entry.get("Row")
-                new_value = entry.get(f"{'Case Synopsis' if column=='EK' else 'Full Text'}", "")
-
-                # Write the data to corresponding cell
-                self.sheet.update_cell(row, required_columns, new_value)
+                new_value = entry.get(value_key)
+                if not row or new_value is None:
+                    write_counts["skipped"] += 1
+                    continue
+                new_values[row] = new_value
+
+            if not new_values:
+                logging.info(f"No values to write for Google Sheet column: {column} - {write_counts}")
+                return write_counts
+
+            # Fetch the current column values in one ranged read covering every target row
+            first_row, last_row = min(new_values), max(new_values)
+            current_range = self.sheets_client.call(self.sheet.get, f"{column}{first_row}:{column}{last_row}", major_dimension="COLUMNS")
+            current_column = current_range[0] if current_range else []
+
+            # Compare normalized values so only changed cells are written
+            changed_rows = []
+            for row in sorted(new_values):
+                offset = row - first_row
+                current_value = current_column[offset] if offset < len(current_column) else ""
+                if normalize_cell_value(current_value) == normalize_cell_value(new_values[row]):
+                    write_counts["unchanged"] += 1
+                else:
+                    changed_rows.append(row)
+
+            # Coalesce contiguous changed rows into single ranges
+            updates = []
+            for start_row, end_row in contiguous_row_runs(changed_rows):
+                updates.append({
+                    "range": f"{column}{start_row}:{column}{end_row}",
+                    "values": [[new_values[row]] for row in range(start_row, end_row + 1)]
+                })
 
-                # Sleep 1 second for each write to avoid rate limits of 60 reqs / user / proj / min
-                if idx < len(data) - 1:
-                    time.sleep(1)
+            # Write the ranges in batches, the shared client paces requests to the Sheets quotas
+            for batch_start in range(0, len(updates), WRITE_BATCH_SIZE):
+                self.sheets_client.call(self.sheet.batch_update, updates[batch_start:batch_start + WRITE_BATCH_SIZE], raw=False, kind="write")
 
-            logging.info(f"Wrote data to Google Sheet column: {column}")
+            write_counts["written"] = len(changed_rows)
+            logging.info(f"Wrote data to Google Sheet column: {column} in {len(updates)} ranges - {write_counts}")
         except Exception as e:
             logging.error(f"Error in GoogleSheetHandler - write_column: {e}")
+        return write_counts
+
+
+# Selectors for the case listing and teaching point sections of a case page
+# Class-substring selectors mirror the original re.compile class matching
+CASE_NAME_SELECTOR = "a.case-name-link.case-name-container"
+DOC_SECTION_SELECTOR = 'div[class*="doc-section"]'
+TP_TOPPER_SELECTOR = 'div[class*="teaching-point-topper"]'
+TP_HEADER_SELECTOR = 'h1[class*="doc-section-header-title"]'
+TP_BODY_SELECTOR = 'div[class*="doc-section-body"]'
+
+
+class HtmlBackend:
+    # Reference backend: BeautifulSoup with the pure-Python html.parser
+    name = "html.parser"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self.soup_class = BeautifulSoup
+
+    def parse(self, html_content):
+        return self.soup_class(html_content, 'html.parser')
+
+    def select(self, node, selector):
+        return node.select(selector)
+
+    def select_first(self, node, selector):
+        return node.select_one(selector)
+
+    def get_text(self, node, separator=""):
+        return node.get_text(separator=separator, strip=True)
+
+    def teaching_point_titles(self, root):
+        # Titles of every doc-section that carries a teaching point topper
+        titles = []
+        for section in self.select(root, DOC_SECTION_SELECTOR):
+            if self.select_first(section, TP_TOPPER_SELECTOR) is not None:
+                header = self.select_first(section, TP_HEADER_SELECTOR)
+                if header is not None:
+                    titles.append(self.get_text(header))
+        return titles
+
+
+class LxmlBackend(HtmlBackend):
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree, html as lxml_html
+        from cssselect import GenericTranslator
+        self.etree = etree
+        self.lxml_html = lxml_html
+        self.parser = lxml_html.HTMLParser(encoding="utf-8")
+        self.translator = GenericTranslator()
+        self.compiled_selectors = {}
+        # Script, style and template contents are skipped, matching BeautifulSoup's get_text
+        self.text_xpath = etree.XPath("descendant::text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::template)]")
+
+    def parse(self, html_content):
+        return self.lxml_html.document_fromstring(html_content.encode("utf-8"), parser=self.parser)
+
+    def compile_selector(self, selector):
+        # Translate each CSS selector to XPath once; "descendant::" excludes the node itself
+        if selector not in self.compiled_selectors:
+            self.compiled_selectors[selector] = self.etree.XPath(self.translator.css_to_xpath(selector, prefix="descendant::"))
+        return self.compiled_selectors[selector]
+
+    def select(self, node, selector):
+        return self.compile_selector(selector)(node)
+
+    def select_first(self, node, selector):
+        matches = self.select(node, selector)
+        return matches[0] if matches else None
+
+    def get_text(self, node, separator=""):
+        strings = (text.strip() for text in self.text_xpath(node))
+        return separator.join(text for text in strings if text)
+
+
+class SelectolaxBackend(HtmlBackend):
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.parser_class = LexborHTMLParser
+
+    def parse(self, html_content):
+        return self.parser_class(html_content)
+
+    def select(self, node, selector):
+        # Lexbor also matches the node itself, the other backends only match descendants.
+        # It never matches inside <template>, where html.parser would return elements with empty text.
+        node_id = getattr(node, "mem_id", None)
+        return [match for match in node.css(selector) if match.mem_id != node_id]
+
+    def select_first(self, node, selector):
+        matches = self.select(node, selector)
+        return matches[0] if matches else None
+
+    def get_text(self, node, separator=""):
+        return separator.join(self.iter_strings(node))
+
+    def iter_strings(self, node):
+        for child in node.iter(include_text=True):
+            if child.tag == "-text":
+                text = child.text_content.strip()
+                if text:
+                    yield text
+            elif child.tag not in ("-comment", "script", "style", "template"):
+                yield from self.iter_strings(child)
+
+
+HTML_BACKENDS = {
+    "selectolax": SelectolaxBackend,
+    "lxml": LxmlBackend,
+    "html.parser": HtmlBackend
+}
+
+def get_html_backend(name=None):
+    # Use the requested backend, or the fastest installed one when set to "auto"
+    name = name or os.environ.get("HTML_PARSER_BACKEND", "auto")
+    if name != "auto" and name not in HTML_BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {name}")
+
+    candidates = list(HTML_BACKENDS) if name == "auto" else [name]
+    for candidate in candidates:
+        try:
+            return HTML_BACKENDS[candidate]()
+        except ImportError as e:
+            logging.warning(f"HTML parser backend {candidate} unavailable, trying the next one: {e}")
+    return HtmlBackend()
+
+# Teaching point title matching: titles are compared after normalize_title, then by trigram overlap
+# Fuzzy matches at or above TP_MATCH_MIN_CONFIDENCE are reported; they are only written to the sheet when they also
+# clear TP_MATCH_WRITE_CONFIDENCE and beat the runner-up title by TP_MATCH_MIN_MARGIN, since near-identical titles
+# such as "Teaching Point 1: ..." and "Teaching Point 2: ..." score close together
+TP_MATCH_MIN_CONFIDENCE = float(os.environ.get("TP_MATCH_MIN_CONFIDENCE", 0.6))
+TP_MATCH_WRITE_CONFIDENCE = float(os.environ.get("TP_MATCH_WRITE_CONFIDENCE", 0.9))
+TP_MATCH_MIN_MARGIN = float(os.environ.get("TP_MATCH_MIN_MARGIN", 0.1))
+# Methods whose title is trusted enough to copy that teaching point's text; "ambiguous" and "weak" are report-only
+TP_MATCH_WRITE_METHODS = ("exact", "normalized", "fuzzy")
+TeachingPointMatch = namedtuple("TeachingPointMatch", ["title", "confidence", "method"])
+
+
+class TeachingPointIndex:
+    # Per-case index of normalized teaching point titles with a character trigram posting list
+    def __init__(self, titles):
+        self.titles = list(titles)
+        self.exact_titles = set(self.titles)
+        self.normalized_titles = {}
+        self.title_trigrams = []
+        self.postings = collections.defaultdict(list)
+        for index, title in enumerate(self.titles):
+            normalized = self.normalize_title(title)
+            self.normalized_titles.setdefault(normalized, title)
+            trigrams = self.trigrams(normalized)
+            self.title_trigrams.append(trigrams)
+            for trigram in trigrams:
+                self.postings[trigram].append(index)
+
+    @staticmethod
+    def normalize_title(title):
+        # Case, punctuation and whitespace drift between the sheet and the page don't count
+        return " ".join(re.sub(r"[\W_]+", " ", title.casefold()).split())
+
+    @staticmethod
+    def trigrams(text):
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def match(self, teaching_point_name):
+        if teaching_point_name in self.exact_titles:
+            return TeachingPointMatch(teaching_point_name, 1.0, "exact")
+        normalized = self.normalize_title(teaching_point_name)
+        if normalized in self.normalized_titles:
+            return TeachingPointMatch(self.normalized_titles[normalized], 1.0, "normalized")
+
+        # Count shared trigrams per title from the postings, then score with the Dice coefficient
+        query_trigrams = self.trigrams(normalized)
+        shared = collections.Counter()
+        for trigram in query_trigrams:
+            for index in self.postings.get(trigram, ()):
+                shared[index] += 1
+        scores = sorted(((2 * count / (len(query_trigrams) + len(self.title_trigrams[index])), index) for index, count in shared.items()), reverse=True)
+        if not scores or scores[0][0] < TP_MATCH_MIN_CONFIDENCE:
+            return TeachingPointMatch(None, scores[0][0] if scores else 0.0, "none")
+        best_score, best_index = scores[0]
+        runner_up_score = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score - runner_up_score < TP_MATCH_MIN_MARGIN:
+            return TeachingPointMatch(self.titles[best_index], best_score, "ambiguous")
+        if best_score < TP_MATCH_WRITE_CONFIDENCE:
+            return TeachingPointMatch(self.titles[best_index], best_score, "weak")
+        return TeachingPointMatch(self.titles[best_index], best_score, "fuzzy")
+
+
+def available_html_backends():
+    backends = []
+    for backend_class in HTML_BACKENDS.values():
+        try:
+            backends.append(backend_class())
+        except ImportError as e:
+            logging.warning(f"Skipping HTML parser backend {backend_class.name}: {e}")
+    return backends
+
+
+# Single-pass text normalizer for case synopses and teaching points
+# Every break sits next to a character outside [a-z\s], so the scan only stops on those characters and
+# each branch checks one insertion rule of the original sequential re.sub passes, in their original order.
+# Branches ending in "_after" break after the matched character, all others break before it.
+TEXT_NORMALIZER_PATTERN = re.compile(
+    r"[^a-z\s](?:"
+    r"(?<=Case Synopsis[A-Z])(?P<case_header>)"
+    r"|(?<=Teaching Point[A-Z])(?P<tp_header>)"
+    r"|(?<=[a-z.?][A-Z])(?P<sentence>)"
+    r"|(?<=:[A-Z])(?P<colon>)"
+    r"|(?<=[^0-9]\d)(?=(?P<numbered>\d*\.))"
+    r"|(?<=[^a-zA-Z\s][A-Z])(?=(?P<lettered>\.))"
+    r"|(?<=\)[A-Z])(?P<parenthetical>)"
+    r"|(?<=:)(?=(?P<colon_after>[a-z]))"
+    r"|(?<=[^a-zA-Z\s])(?=(?P<lettered_after>[a-z]\.))"
+    r"|(?<=\))(?=(?P<parenthetical_after>[a-z]))"
+    r")"
+)
+
+# Branch -> (original pass, inserted text, width of the left context that pass consumed)
+TEXT_NORMALIZER_RULES = {
+    "case_header": ("case_header", ": ", len("Case Synopsis")),
+    "tp_header": ("tp_header", ": ", len("Teaching Point")),
+    "sentence": ("sentence", "\n", 1),
+    "colon": ("colon", "\n", 1),
+    "numbered": ("numbered", "\n", 1),
+    "lettered": ("lettered", "\n", 1),
+    "parenthetical": ("parenthetical", "\n", 1),
+    "colon_after": ("colon", "\n", 1),
+    "lettered_after": ("lettered", "\n", 1),
+    "parenthetical_after": ("parenthetical", "\n", 1)
+}
+
+def normalize_text_content(text_content):
+    # Literal header removal first, exactly like the original passes
+    text_content = text_content.replace("CASE SYNOPSIS", "").replace("TEACHING POINT", "")
+    consumed_until = {}
+
+    def insert_break(match):
+        branch = match.lastgroup
+        original_pass, inserted, left_width = TEXT_NORMALIZER_RULES[branch]
+        char = match.group()
+        break_after = branch.endswith("_after")
+        boundary = match.end() if break_after else match.start()
+
+        # A sequential re.sub pass never reuses characters consumed by its previous match,
+        # e.g. "a1.2." only breaks before "1." - skip boundaries whose left context was consumed
+        if boundary - left_width < consumed_until.get(original_pass, 0):
+            # A skipped header boundary still gets the lowercase/uppercase break
+            return "\n" + char if original_pass in ("case_header", "tp_header") else char
+        consumed_until[original_pass] = match.end(branch)
+        return char + inserted if break_after else inserted + char
+
+    return TEXT_NORMALIZER_PATTERN.sub(insert_break, text_content)
+
+def reference_clean_text_content(text_content):
+    # Original eleven-pass implementation, kept as the golden reference for normalize_text_content
+    # Remove "CASE SYNOPSIS" from the front of the synopses
+    text_content = re.sub(r"CASE SYNOPSIS", "", text_content)
+    text_content = re.sub(r"TEACHING POINT", "", text_content)
+    # Add a colon and space after specific header
+    text_content = re.sub(r"(Case Synopsis)([A-Z])", r"\1: \2", text_content)
+    text_content = re.sub(r"(Teaching Point)([A-Z])", r"\1: \2", text_content)
+    # Add newlines between each section and paragraph
+    text_content = re.sub(r"([a-z])([A-Z])", r"\1\n\2", text_content)
+    text_content = re.sub(r"(\.)([A-Z])", r"\1\n\2", text_content)
+    text_content = re.sub(r"(\?)([A-Z])", r"\1\n\2", text_content)
+    text_content = re.sub(r"(\:)([a-zA-Z])", r"\1\n\2", text_content)
+    # Add newline between numbered or lettered list items
+    text_content = re.sub(r"([^0-9])(\d+\.)", r"\1\n\2", text_content)
+    text_content = re.sub(r"([^a-zA-Z\s])([a-zA-Z]\.)", r"\1\n\2", text_content)
+    # Add newline between concatenated parentheticals and next sentence
+    text_content = re.sub(r"(\))([a-zA-Z])", r"\1\n\2", text_content)
+    return text_content
+
+
+# Browser viewport shared by the login context and every worker context
+VIEWPORT = {'width': 1920, 'height': 2200, 'device_scale_factor': 1}
+
+# Recycle the worker context after this many page leases or once Chromium passes the RSS ceiling
+CONTEXT_RECYCLE_PAGES = int(os.environ.get("CONTEXT_RECYCLE_PAGES", 200))
+CONTEXT_RSS_CEILING_MB = int(os.environ.get("CONTEXT_RSS_CEILING_MB", 3072))
+RSS_SAMPLE_EVERY_PAGES = 10
+
+def browser_rss_mb():
+    # Resident memory of the Chromium processes under this Python process, None without psutil
+    try:
+        import psutil
+    except ImportError:
+        return None
+    total_rss = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            name = child.name().lower()
+            if "chrom" in name or "headless_shell" in name:
+                total_rss += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total_rss / (1024 * 1024)
+
+def process_rss_mb():
+    # Resident memory of this Python process, None without psutil
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+# Opt-in memory profiling of the run's stages: tracemalloc top allocations per stage plus an RSS time series
+MEMORY_PROFILE = os.environ.get("MEMORY_PROFILE", "0") == "1"
+MEMORY_PROFILE_TOP = int(os.environ.get("MEMORY_PROFILE_TOP", 15))
+MEMORY_SAMPLE_SECONDS = float(os.environ.get("MEMORY_SAMPLE_SECONDS", 5))
+MEMORY_PROFILE_PREFIX = os.environ.get("MEMORY_PROFILE_PREFIX", "memory-profile")
+
+
+class MemoryProfiler:
+    def __init__(self, enabled=MEMORY_PROFILE, top=MEMORY_PROFILE_TOP, interval=MEMORY_SAMPLE_SECONDS):
+        self.enabled = enabled
+        self.top = top
+        self.interval = interval
+        self.current_stage = "startup"
+        self.samples = []
+        self.report_lines = []
+        self.stop_sampling = threading.Event()
+        self.sampler = None
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+
+    def start(self):
+        if not self.enabled:
+            return
+        # Keep a few frames per allocation so the report shows who called into bs4 / playwright
+        tracemalloc.start(5)
+        self.sampler = threading.Thread(target=self.sample_until_stopped, daemon=True)
+        self.sampler.start()
+        logging.info(f"Memory profiling on, sampling RSS every {self.interval}s")
+
+    def sample(self):
+        traced_mb = tracemalloc.get_traced_memory()[0] / (1024 * 1024) if tracemalloc.is_tracing() else None
+        self.samples.append((round(time.perf_counter() - PROCESS_START, 2), self.current_stage, process_rss_mb(), browser_rss_mb(), traced_mb))
+
+    def sample_until_stopped(self):
+        while not self.stop_sampling.wait(self.interval):
+            self.sample()
+
+    def snapshot(self):
+        # Leave tracemalloc's own bookkeeping and the import machinery out of the report
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        self.current_stage = name
+        tracemalloc.reset_peak()
+        before = self.snapshot()
+        self.sample()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sample()
+            # Growth by source line over the stage: what the stage allocated and still holds at its end
+            stats = self.snapshot().compare_to(before, "lineno")
+            current, peak = tracemalloc.get_traced_memory()
+            self.report_lines.append(f"== {name}: {time.perf_counter() - start:.1f}s, traced {current / 1048576:.1f} MB now, {peak / 1048576:.1f} MB peak")
+            self.report_lines.extend(f"  {stat}" for stat in stats[:self.top])
+            logging.info(f"Memory after {name} stage: traced {current / 1048576:.1f} MB (peak {peak / 1048576:.1f} MB), RSS {self.samples[-1][2]} MB, browser {self.samples[-1][3]} MB")
+            self.current_stage = f"after {name}"
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.stop_sampling.set()
+        self.sampler.join()
+        self.sample()
+        tracemalloc.stop()
+        with open(f"{MEMORY_PROFILE_PREFIX}-{self.run_id}.csv", "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Seconds", "Stage", "Python RSS MB", "Browser RSS MB", "Traced MB"])
+            writer.writerows(self.samples)
+        with open(f"{MEMORY_PROFILE_PREFIX}-{self.run_id}.txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(self.report_lines) + "\n")
+        logging.info(f"Memory profile written to {MEMORY_PROFILE_PREFIX}-{self.run_id}.csv and .txt")
+
+
+class PageLeaseManager:
+    def __init__(self, browser, auth_context, recycle_after_pages=CONTEXT_RECYCLE_PAGES, rss_ceiling_mb=CONTEXT_RSS_CEILING_MB, browser_is_local=True):
+        self.browser = browser
+        self.auth_context = auth_context  # logged-in context whose auth state every worker context clones
+        self.recycle_after_pages = recycle_after_pages
+        self.rss_ceiling_mb = rss_ceiling_mb
+        # browser_rss_mb only sees Chromium processes started by this process, so a daemon's browser is invisible to it
+        self.browser_is_local = browser_is_local
+        if not browser_is_local:
+            logging.warning(f"Browser RSS ceiling of {rss_ceiling_mb} MB not enforced: the daemon's Chromium processes are not children of this process; "
+                            f"contexts still recycle every {recycle_after_pages} pages")
+        self.context = None
+        self.context_leases = {}
+        self.retiring_contexts = set()
+        self.pages_on_context = 0
+        self.lock = asyncio.Lock()
+        self.metrics = {
+            "pages_opened": 0,
+            "pages_closed": 0,
+            "open_pages": 0,
+            "peak_open_pages": 0,
+            "leaked_pages_closed": 0,
+            "context_recycles": 0,
+            "browser_rss_mb": None
+        }
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        # Hand out a page that is closed on every exit path, success or error
+        context = await self.acquire_context()
+        page = None
+        try:
+            page = await context.new_page()
+            self.metrics["pages_opened"] += 1
+            self.metrics["open_pages"] += 1
+            self.metrics["peak_open_pages"] = max(self.metrics["peak_open_pages"], self.metrics["open_pages"])
+            yield page
+        finally:
+            if page is not None:
+                await self.close_page(page)
+            await self.release_context(context)
+
+    async def acquire_context(self):
+        async with self.lock:
+            reason = self.recycle_reason()
+            if reason:
+                await self.recycle_context(reason)
+            self.context_leases[self.context] += 1
+            self.pages_on_context += 1
+            return self.context
+
+    def recycle_reason(self):
+        if self.context is None:
+            return "initial context"
+        if self.pages_on_context >= self.recycle_after_pages:
+            return f"{self.pages_on_context} pages leased"
+        if self.browser_is_local and self.pages_on_context % RSS_SAMPLE_EVERY_PAGES == 0:
+            self.metrics["browser_rss_mb"] = browser_rss_mb()
+            if self.metrics["browser_rss_mb"] is not None and self.metrics["browser_rss_mb"] > self.rss_ceiling_mb:
+                return f"browser RSS {self.metrics['browser_rss_mb']:.0f} MB over {self.rss_ceiling_mb} MB"
+        return None
+
+    async def recycle_context(self, reason):
+        # Clone the cookies and local storage of the logged-in context into a fresh worker context
+        storage_state = await self.auth_context.storage_state()
+        old_context = self.context
+        self.context = await self.browser.new_context(viewport=VIEWPORT, storage_state=storage_state)
+        self.context_leases[self.context] = 0
+        self.pages_on_context = 0
+
+        if old_context is not None:
+            self.metrics["context_recycles"] += 1
+            logging.info(f"CONTEXT RECYCLED ({reason}) - page lease metrics: {self.metrics}")
+            # Pages still in use keep the old context alive until their leases are released
+            if self.context_leases[old_context]:
+                self.retiring_contexts.add(old_context)
+            else:
+                await self.close_context(old_context)
+
+    async def release_context(self, context):
+        async with self.lock:
+            self.context_leases[context] -= 1
+            if context in self.retiring_contexts and not self.context_leases[context]:
+                self.retiring_contexts.discard(context)
+                await self.close_context(context)
+
+    async def close_page(self, page):
+        try:
+            await page.close()
+        except Exception as e:
+            logging.error(f"Error closing leased page: {e}")
+        self.metrics["pages_closed"] += 1
+        self.metrics["open_pages"] -= 1
+
+    async def close_context(self, context):
+        # Any page left in a context with no leases was opened outside a lease (e.g. a popup) and leaked
+        leaked_pages = [page for page in context.pages if not page.is_closed()]
+        if leaked_pages:
+            self.metrics["leaked_pages_closed"] += len(leaked_pages)
+            logging.warning(f"Closing {len(leaked_pages)} leaked pages found in worker context")
+        try:
+            await context.close()
+        except Exception as e:
+            logging.error(f"Error closing worker context: {e}")
+        self.context_leases.pop(context, None)
+
+    async def close(self):
+        async with self.lock:
+            for context in list(self.context_leases):
+                await self.close_context(context)
+            self.context = None
+            self.retiring_contexts.clear()
+        self.metrics["browser_rss_mb"] = browser_rss_mb()
+        logging.info(f"PAGE LEASE METRICS: {self.metrics}")
+
+
+# Optional warm browser daemon (browser-daemon subcommand) that both this script and the RPA script connect to
+# The daemon keeps a persistent, logged-in Chromium profile alive and exposes it over CDP on localhost only.
+# CDP has no authentication: any local process or user that can reach the port can drive the logged-in
+# session and read its cookies, and a client can't tell the daemon from anything else listening there.
+# Both the daemon and its clients are therefore off unless BROWSER_DAEMON=1; only enable it on a single-user machine.
+BROWSER_DAEMON = os.environ.get("BROWSER_DAEMON", "0") == "1"
+BROWSER_DAEMON_PORT = int(os.environ.get("BROWSER_DAEMON_PORT", 9333))
+BROWSER_DAEMON_ENDPOINT = os.environ.get("BROWSER_DAEMON_ENDPOINT", f"http://127.0.0.1:{BROWSER_DAEMON_PORT}")
+BROWSER_DAEMON_PROFILE = os.environ.get("BROWSER_DAEMON_PROFILE", os.path.join(os.path.expanduser("~"), ".cache", "org-browser-daemon"))
+BROWSER_DAEMON_IDLE_TIMEOUT = int(os.environ.get("BROWSER_DAEMON_IDLE_TIMEOUT", 3600))
+BROWSER_DAEMON_HEALTH_INTERVAL = 30
+
+def daemon_available(endpoint=BROWSER_DAEMON_ENDPOINT, timeout=0.5):
+    # Health check: the daemon's CDP endpoint answers /json/version when the browser is up
+    try:
+        with urllib.request.urlopen(f"{endpoint}/json/version", timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+async def run_browser_daemon(idle_timeout=BROWSER_DAEMON_IDLE_TIMEOUT):
+    if not BROWSER_DAEMON:
+        logging.error("The browser daemon exposes an unauthenticated CDP port; set BROWSER_DAEMON=1 to run it")
+        return False
+    from playwright.async_api import async_playwright
+    playwright = await async_playwright().start()
+    # Keep the logged-in profile readable by this user only
+    os.makedirs(BROWSER_DAEMON_PROFILE, mode=0o700, exist_ok=True)
+    os.chmod(BROWSER_DAEMON_PROFILE, 0o700)
+
+    async def launch():
+        context = await playwright.chromium.launch_persistent_context(
+            BROWSER_DAEMON_PROFILE, headless=True, viewport=VIEWPORT,
+            args=[f"--remote-debugging-port={BROWSER_DAEMON_PORT}", "--remote-debugging-address=127.0.0.1"]
+        )
+        # Keep one blank page open so the browser stays alive between clients
+        if not context.pages:
+            await context.new_page()
+        logging.info(f"Browser daemon listening on {BROWSER_DAEMON_ENDPOINT} with profile {BROWSER_DAEMON_PROFILE}")
+        logging.warning(f"Any local process can drive the logged-in session through {BROWSER_DAEMON_ENDPOINT} until the daemon stops")
+        return context
+
+    context = await launch()
+    idle_since = time.monotonic()
+    try:
+        while True:
+            await asyncio.sleep(BROWSER_DAEMON_HEALTH_INTERVAL)
+
+            # Relaunch the browser if it crashed or stopped answering on the CDP endpoint
+            if not await asyncio.to_thread(daemon_available):
+                logging.error("Browser daemon failed its health check, relaunching")
+                try:
+                    await context.close()
+                except Exception as e:
+                    logging.error(f"Error closing unhealthy daemon context: {e}")
+                context = await launch()
+                idle_since = time.monotonic()
+                continue
+
+            # Any page beyond the blank keeper page means a client is working
+            if len(context.pages) > 1:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > idle_timeout:
+                logging.info(f"Browser daemon idle for {idle_timeout}s, shutting down")
+                break
+    finally:
+        await context.close()
+        await playwright.stop()
+    return True
 
 
 class WebScraper:
-    def __init__(self, base_url):
+    def __init__(self, base_url, html_backend=None):
         self.base_url = base_url
         self.browser = None
         self.context = None
         self.page = None
+        self.html_backend = html_backend or get_html_backend()
+        self.page_leases = None
+        self.daemon_connected = False
+        logging.info(f"Using HTML parser backend: {self.html_backend.name}")
 
-    async def setup_browser(self):
+    async def setup_browser(self, storage_state=None, use_daemon=True):
+        from playwright.async_api import async_playwright
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=True)
-        self.context = await self.browser.new_context(viewport={'width': 1920, 'height': 2200, 'device_scale_factor': 1})
+
+        # Reuse the warm browser daemon when it is running, otherwise launch Chromium locally
+        if use_daemon and BROWSER_DAEMON and await asyncio.to_thread(daemon_available):
+            try:
+                self.browser = await self.playwright.chromium.connect_over_cdp(BROWSER_DAEMON_ENDPOINT)
+                # The daemon's persistent context keeps the login cookies from earlier runs
+                self.context = self.browser.contexts[0]
+                self.daemon_connected = True
+                logging.info(f"Connected to browser daemon at {BROWSER_DAEMON_ENDPOINT}")
+            except Exception as e:
+                logging.error(f"Failed to connect to browser daemon, falling back to local launch: {e}")
+
+        if not self.daemon_connected:
+            self.browser = await self.playwright.chromium.launch(headless=True)
+            # Queue workers start from the session state saved by whichever worker logged in
+            self.context = await self.browser.new_context(viewport=VIEWPORT, storage_state=storage_state)
         self.page = await self.context.new_page()
+        # Case scrapes lease their pages from worker contexts cloned from this (logged-in) context
+        self.page_leases = PageLeaseManager(self.browser, self.context, browser_is_local=not self.daemon_connected)
 
     async def close_browser(self):
-        await self.context.close()
+        await self.page_leases.close()
+        if self.daemon_connected:
+            # Leave the daemon's context running, close only our page and disconnect
+            await self.page.close()
+        else:
+            await self.context.close()
         await self.browser.close()
         await self.playwright.stop()
 
-    async def attempt_login_page(self):
+    async def attempt_login_page(self, Org_UN, Org_PW):
         await self.page.goto("https://placeholder.org.com/users/sign_in")
         await self.page.wait_for_load_state("networkidle")
         logging.info(f"Accessed Org home page: {self.page.url}")
@@ -150,10 +1003,15 @@ class WebScraper:
         await self.page.get_by_label("Password").fill(Org_PW)
         await self.page.keyboard.press("Enter")
 
-    async def navigate_to_repository(self, url):
-        await self.page.goto(url)
-        await self.page.wait_for_load_state("networkidle")
-
+    async def is_authenticated(self):
+        # A warm session lands on the site instead of being redirected to the sign-in page
+        try:
+            await self.page.goto(self.base_url)
+            await self.page.wait_for_load_state("domcontentloaded")
+            return "users/sign_in" not in self.page.url
+        except Exception as e:
+            logging.error(f"Error checking for an authenticated session: {e}")
+            return False
 
     async def get_2fa_code(self, org_un, org_pw):
         try:
@@ -279,126 +1137,108 @@ class WebScraper:
             return None
 
 
-    async def scroll_around(self):
-        await self.page.keyboard.press('PageDown')
-        await self.page.keyboard.press('PageDown')
-        await self.page.keyboard.press('PageDown')
-        await asyncio.sleep(2)
-        await self.page.keyboard.press('PageDown')
-        await self.page.keyboard.press('PageDown')
-        await self.page.keyboard.press('PageDown')
-        await asyncio.sleep(2)
-        await self.page.keyboard.press('PageDown')
-        await self.page.keyboard.press('PageDown')
-        await self.page.keyboard.press('PageDown')
-        await asyncio.sleep(2)
-        return None
-   
     async def scrape_case(self, case_name, course_url, case_scrapes): # need to add any other necessary attributes
+        log_time_to_first_work("first case scrape")
         try:
-            # Enter a case using existing methods
-            page = await self.context.new_page()
-            await page.goto(course_url)
-            await page.wait_for_load_state("domcontentloaded")
-            await self.scroll_around()
-            await page.locator(f'a:has-text("{case_name}")').first.click()
-            await page.wait_for_function("() => window.location.href.includes('/document_set_document_relations')", timeout=10000)
-            await page.wait_for_load_state("networkidle")
-            logging.info(f"Entered case: {case_name} at url: {page.url}")
-            # Change the viewing mode to 'full'
-            selector = page.locator('select.doc-controls-select.doc-controls-view-mode').first
-            await selector.select_option("full")
-            await page.wait_for_load_state("domcontentloaded")
-            # Pull the entire text content or html content of the page
-            html_content = await page.content()
-            text_content = await page.text_content("div.doc-body.full-display-mode")
-            await page.close()
+            # Enter a case using existing methods, the leased page is closed even if a step fails
+            async with self.page_leases.lease() as page:
+                await page.goto(course_url)
+                await page.wait_for_load_state("domcontentloaded")
+                # The click scrolls the case link into view on the leased page
+                await page.locator(f'a:has-text("{case_name}")').first.click()
+                await page.wait_for_function("() => window.location.href.includes('/document_set_document_relations')", timeout=10000)
+                await page.wait_for_load_state("networkidle")
+                logging.info(f"Entered case: {case_name} at url: {page.url}")
+                # Change the viewing mode to 'full'
+                selector = page.locator('select.doc-controls-select.doc-controls-view-mode').first
+                await selector.select_option("full")
+                await page.wait_for_load_state("domcontentloaded")
+                # Pull the entire text content or html content of the page
+                html_content = await page.content()
+                text_content = await page.text_content("div.doc-body.full-display-mode")
             # return the raw scrape
             case_scrapes[case_name] = {
                 "html_content": html_content,
                 "text_content": text_content
             }
-            logging.info(f"Scraped content for case {case_name}:\nHTML snip - {html_content[:150]} \nText snip - {text_content[:150]}")
+            logging.info(f"Scraped content for case {case_name}: {len(html_content)} HTML chars, {len(text_content or '')} text chars")
+            payload_logger.debug(f"Scraped content for case {case_name}:\nHTML snip - {html_content[:150]} \nText snip - {text_content[:150]}")
         except Exception as e:
             logging.error(f"Error in scrape_case for case: {case_name} - {e}")
 
         finally:
             return case_scrapes
    
-    async def get_case_names(self, course_url, course_name, case_names):
-        try:
-            await self.page.goto(course_url)
-            await self.page.wait_for_load_state("networkidle")
-            # Pull full html of repository page
-            html_content = await self.page.content()
-            # Parse HTML content using Soup
-            soup = BeautifulSoup(html_content, 'html.parser')
-            # Find all <a> elements with the target class
-            case_elements = soup.find_all('a', class_='case-name-link case-name-container')
-            # Extract & clean the text content for each case name
-            for element in case_elements:
-                case_name = element.get_text(strip=True)
-                case_names.append(case_name)
-            logging.info(f"Extracted case names from course repository: {course_name}: {course_url}")
-        except Exception as e:
-            logging.error(f"Error in get_case_names for {course_name}: {course_url} - {e}")
-        finally:
-            return case_names
+    async def list_case_names(self, course_url):
+        # Case names listed on a leased page; errors propagate so a queued course can be retried
+        async with self.page_leases.lease() as page:
+            await page.goto(course_url)
+            await page.wait_for_load_state("networkidle")
+            html_content = await page.content()
+        return self.extract_case_names(html_content)
+
+    def extract_case_names(self, html_content):
+        root = self.html_backend.parse(html_content)
+        return [self.html_backend.get_text(element) for element in self.html_backend.select(root, CASE_NAME_SELECTOR)]
 
     def parse_teaching_point(self, case_scrape, teaching_point_name):
         try:
             # Get the HTML content from the case_scrape
             html_content = case_scrape['html_content']
 
-            # Parse the HTML content using BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
+            # Parse the HTML content with the configured parser backend
+            backend = self.html_backend
+            root = backend.parse(html_content)
 
             try:
                 # Locate all doc-sections
-                doc_sections = soup.find_all('div', class_=re.compile("doc-section"))
-                logging.info(f"Total doc-sections found: {len(doc_sections)} for html-TP search: '{teaching_point_name}'")
+                doc_sections = backend.select(root, DOC_SECTION_SELECTOR)
+                logging.info(f"Total doc-sections found: {len(doc_sections)} for html-TP search: '{teaching_point_name}'", extra=LOG_SAMPLED)
 
                 for section in doc_sections:
                     # Check for the presence of a teaching-point-topper within this section
-                    topper = section.find('div', class_=re.compile("teaching-point-topper"))
-                    logging.info(f"Located TP Topper container for '{teaching_point_name}', searching for title header next.")
-                    if topper:
+                    topper = backend.select_first(section, TP_TOPPER_SELECTOR)
+                    payload_logger.debug(f"Located TP Topper container for '{teaching_point_name}', searching for title header next.")
+                    if topper is not None:
                         # Locate the h1 element within the section header
-                        header = section.find('h1', class_=re.compile("doc-section-header-title"))
-                        logging.info(f"Located TP Header Title container for '{teaching_point_name}', checking match for TP next.")
-                        if header and header.get_text(strip=True) == teaching_point_name:
+                        header = backend.select_first(section, TP_HEADER_SELECTOR)
+                        payload_logger.debug(f"Located TP Header Title container for '{teaching_point_name}', checking match for TP next.")
+                        if header is not None and backend.get_text(header) == teaching_point_name:
                             # If a match is found, extract all text from the doc-children within the doc-section-body
-                            body = section.find('div', class_=re.compile("doc-section-body"))
-                            logging.info(f"Located a doc-section-body match for TP Title '{teaching_point_name}', extracting text next.")
-                            if body:
-                                full_text = body.get_text(separator="\n", strip=True)
-                                logging.info(f"Located Full Text for TP: '{teaching_point_name}' - Full Text: {full_text[:150]}")
+                            body = backend.select_first(section, TP_BODY_SELECTOR)
+                            logging.info(f"Located a doc-section-body match for TP Title '{teaching_point_name}', extracting text next.", extra=LOG_SAMPLED)
+                            if body is not None:
+                                full_text = backend.get_text(body, separator="\n")
+                                payload_logger.debug(f"Located Full Text for TP: '{teaching_point_name}' - Full Text: {full_text[:150]}")
                                 return full_text
 
+                # Exact titles only; write_results matches near-miss titles against the stored parse results
                 logging.error(f'Teaching point: {teaching_point_name} not found in the given case scrape.')
                 return None
-            
+
             except Exception as e:
-                logging.error(f"Error in 1st try of parse_teaching_point for TP name: {teaching_point_name} - {e}")
-                try:
-                    # Alternative search attempt
-                    doc_section = soup.find('div', attrs={f'"class": "doc-section-header", "string":"{re.compile(teaching_point_name)}"'})
-                    if doc_section:
-                        element = doc_section.find_parent('div', class_='doc-section')
-                        logging.info(f"Located following match for doc-section on 2nd try: {doc_section[:150]}")
-                        body = element.find('div', class_='doc-section-body')
-                        if body:
-                            full_text = body.get_text(separator="\n", strip=True)
-                            logging.info(f"Located Full Text for TP in alternative search: '{teaching_point_name}' - Unclean Text: {full_text[:150]}")
-                            return full_text
-                except Exception as e:
-                    logging.error(f'Error in 2nd try of parse_teaching_point for TP name: {teaching_point_name} - {e}\nFAILED TP EXTRACTION FROM HTML - Examine HTML here:\n{body}')
-                    return None
+                logging.error(f"Error searching doc-sections in parse_teaching_point for TP name: {teaching_point_name} - {e}")
+                return None
 
         except Exception as e:
             logging.error(f'Error in parse_teaching_point for teaching_point_name: {teaching_point_name} - {e}')
             return None
 
+    def parse_teaching_points(self, case_scrape):
+        # Every teaching point in the case at once, title -> text, for the parse stage
+        backend = self.html_backend
+        root = backend.parse(case_scrape['html_content'])
+        teaching_points = {}
+        for section in backend.select(root, DOC_SECTION_SELECTOR):
+            if backend.select_first(section, TP_TOPPER_SELECTOR) is None:
+                continue
+            header = backend.select_first(section, TP_HEADER_SELECTOR)
+            body = backend.select_first(section, TP_BODY_SELECTOR)
+            # Keep the first section per title, as parse_teaching_point does
+            if header is not None and body is not None:
+                teaching_points.setdefault(backend.get_text(header), backend.get_text(body, separator="\n"))
+        return teaching_points
+
     def parse_synopsis(self, case_scrape):
         try:
             # Get the text content from the case_scrape
@@ -420,7 +1260,7 @@ class WebScraper:
             
             # Clean the raw extracted synopsis text
             clean_synopsis = self.clean_text_content(raw_synopsis)
-            logging.info(f"Parsed and cleaned synopsis: {clean_synopsis}")
+            payload_logger.debug(f"Parsed and cleaned synopsis: {clean_synopsis}")
             return clean_synopsis
             
         except Exception as e:
@@ -428,33 +1268,150 @@ class WebScraper:
             return None
 
     def clean_text_content(self, text_content):
-        # Remove "CASE SYNOPSIS" from the front of the synopses
-        text_content = re.sub(r"CASE SYNOPSIS", "", text_content)
-        text_content = re.sub(r"TEACHING POINT", "", text_content)
-        # Add a colon and space after specific header
-        text_content = re.sub(r"(Case Synopsis)([A-Z])", r"\1: \2", text_content)
-        text_content = re.sub(r"(Teaching Point)([A-Z])", r"\1: \2", text_content)
-        # Add newlines between each section and paragraph
-        text_content = re.sub(r"([a-z])([A-Z])", r"\1\n\2", text_content)
-        text_content = re.sub(r"(\.)([A-Z])", r"\1\n\2", text_content)
-        text_content = re.sub(r"(\?)([A-Z])", r"\1\n\2", text_content)
-        text_content = re.sub(r"(\:)([a-zA-Z])", r"\1\n\2", text_content)
-        # Add newline between numbered or lettered list items
-        text_content = re.sub(r"([^0-9])(\d+\.)", r"\1\n\2", text_content)
-        text_content = re.sub(r"([^a-zA-Z\s])([a-zA-Z]\.)", r"\1\n\2", text_content)
-        # Add newline between concatenated parentheticals and next sentence
-        text_content = re.sub(r"(\))([a-zA-Z])", r"\1\n\2", text_content)
-        return text_content
+        # Header fixes, camel-case breaks, list-item and parenthetical splits in one compiled scan
+        return normalize_text_content(text_content)
+
+
+# Per-row teaching point match report from the write stage
+TP_MATCH_REPORT_FILE = os.environ.get("TP_MATCH_REPORT_FILE", "teaching_point_matches.csv")
+
+# Content-addressed parse cache: case content that hasn't changed since an earlier run is not parsed again
+# Bump PARSER_VERSION whenever parse_synopsis, clean_text_content or parse_teaching_points change their output
+PARSER_VERSION = "1"
+PARSE_CACHE_FILE = os.environ.get("PARSE_CACHE_FILE", "parse-cache.sqlite3")
+PARSE_CACHE_MAX_MB = int(os.environ.get("PARSE_CACHE_MAX_MB", 256))
+PARSE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    content_key TEXT PRIMARY KEY,
+    parser_version TEXT,
+    synopsis TEXT,
+    teaching_points TEXT,
+    size INTEGER,
+    last_used REAL
+);
+"""
+# Parts of a page that change between scrapes of the same case content
+VOLATILE_HTML_PATTERN = re.compile(r"<(script|style|noscript)\b.*?</\1\s*>|<meta\b[^>]*>|<input\b[^>]*type=[\"']hidden[\"'][^>]*>", re.S | re.I)
+
+def parse_cache_key(html_content, text_content):
+    # Hash the page body without scripts, styles and hidden inputs, plus the text the synopsis comes from
+    body_start = html_content.find("<body")
+    body = VOLATILE_HTML_PATTERN.sub("", html_content[max(body_start, 0):])
+    digest = hashlib.sha256(PARSER_VERSION.encode("utf-8"))
+    for part in (body, text_content or ""):
+        digest.update(b"\0")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ParseCache:
+    def __init__(self, path=PARSE_CACHE_FILE, max_bytes=PARSE_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(PARSE_CACHE_SCHEMA)
+
+    def save(self, entries, hit_keys):
+        # New results go in and hits are marked as used, in one transaction, then the cache is trimmed
+        now = time.time()
+        with self.connection:
+            for content_key, synopsis, teaching_points in entries:
+                teaching_points_json = json.dumps(teaching_points)
+                size = len(content_key) + len(synopsis or "") + len(teaching_points_json)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO parse_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (content_key, PARSER_VERSION, synopsis, teaching_points_json, size, now)
+                )
+            self.connection.executemany("UPDATE parse_cache SET last_used = ? WHERE content_key = ?", [(now, content_key) for content_key in hit_keys])
+        self.evict()
+
+    def evict(self):
+        # Results from older parser versions can never hit again; then drop least recently used past the size cap
+        with self.connection:
+            self.connection.execute("DELETE FROM parse_cache WHERE parser_version != ?", (PARSER_VERSION,))
+            total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+            evicted = []
+            for content_key, size in self.connection.execute("SELECT content_key, size FROM parse_cache ORDER BY last_used"):
+                if total_bytes <= self.max_bytes:
+                    break
+                evicted.append((content_key,))
+                total_bytes -= size
+            self.connection.executemany("DELETE FROM parse_cache WHERE content_key = ?", evicted)
+        if evicted:
+            logging.info(f"Evicted {len(evicted)} parse cache entries, {total_bytes / 1048576:.1f} MB left in {self.path}")
+
+    def close(self):
+        self.connection.close()
+
+
+# Parse stage workers: each process opens the store and the parse cache read-only and parses cases by name
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", os.cpu_count() or 1))
+parse_worker_state = None
+
+def init_parse_worker(store_path, backend_name, cache_path, log_queue):
+    global parse_worker_state
+    log_to_queue(log_queue)
+    connection = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    cache_connection = sqlite3.connect(f"file:{cache_path}?mode=ro", uri=True)
+    parse_worker_state = (connection, cache_connection, WebScraper(base_url=BASE_URL, html_backend=get_html_backend(backend_name)))
+
+def parse_stored_case(case_name):
+    # Returns the parse result plus its content key and whether it came from the cache
+    connection, cache_connection, scraper = parse_worker_state
+    html_content, text_content = connection.execute(
+        "SELECT html_content, text_content FROM case_scrapes WHERE case_name = ?", (case_name,)
+    ).fetchone()
+    content_key = parse_cache_key(html_content, text_content)
+    cached = cache_connection.execute("SELECT synopsis, teaching_points FROM parse_cache WHERE content_key = ?", (content_key,)).fetchone()
+    if cached is not None:
+        return case_name, cached[0], json.loads(cached[1]), content_key, True
+    case_scrape = {"html_content": html_content, "text_content": text_content}
+    return case_name, scraper.parse_synopsis(case_scrape), scraper.parse_teaching_points(case_scrape), content_key, False
+
+
+# Deadline scheduling: with a time budget, scrape the most valuable cases that are predicted to fit
+SCRAPE_DEFAULT_SECONDS = float(os.environ.get("SCRAPE_DEFAULT_SECONDS", 30))
+# Part of a run's budget held back for the parse and write stages
+DEADLINE_RESERVE_SECONDS = float(os.environ.get("DEADLINE_RESERVE_SECONDS", 120))
+
+
+class CaseScheduler:
+    def __init__(self, latencies, values, concurrency):
+        self.latencies = latencies
+        self.values = values
+        self.concurrency = concurrency
+        # Cases without history are predicted at the median of the cases with it
+        self.default_seconds = statistics.median(latencies.values()) if latencies else SCRAPE_DEFAULT_SECONDS
+
+    def predicted_seconds(self, case_name):
+        return self.latencies.get(case_name, self.default_seconds)
+
+    def schedule(self, plan, budget_seconds):
+        # Most sheet cells to fill first, then most rows fed, then cheapest; cases that would overrun are deferred
+        ordered = sorted(plan, key=lambda entry: (
+            tuple(-value for value in self.values.get(entry[0], (0, 0))), self.predicted_seconds(entry[0])
+        ))
+        capacity = budget_seconds * self.concurrency
+        scheduled, deferred = [], []
+        predicted = 0.0
+        for entry in ordered:
+            seconds = self.predicted_seconds(entry[0])
+            if predicted + seconds <= capacity:
+                scheduled.append(entry)
+                predicted += seconds
+            else:
+                deferred.append(entry)
+        logging.info(f"Scheduled {len(scheduled)} of {len(plan)} cases in a {budget_seconds:.0f}s budget "
+                     f"(predicted {predicted / self.concurrency:.0f}s at {self.concurrency} concurrent), {len(deferred)} deferred")
+        return scheduled, deferred
 
 
 class Coordinator:
-    def __init__(self, sheet_handler, scraper):
+    def __init__(self, store, sheet_handler=None, scraper=None):
+        self.store = store
         self.sheet_handler = sheet_handler
         self.scraper = scraper
-        self.case_synopsis_cache = {} #add caching for case synopsis
-        self.teaching_point_cache = {} #add caching for teaching points
-        self.processed_cases = set()
-        self.processed_index = 0 # New attribute to track last processed index
 
     def get_course_url(self, course_name):
         stripped_course_name = course_name.strip()
@@ -462,99 +1419,172 @@ class Coordinator:
             return courses[stripped_course_name]
         else:
             raise ValueError(f"No URL found for course: {stripped_course_name}")
-       
-    def create_state(self, case_scrapes, processed_cases):
-        state = {
-            'case_scrapes': case_scrapes,
-            'processed_cases': processed_cases,
-        }
-        save_state(state)
 
-
-    async def process_cases(self):
+    async def scrape_cases(self, budget_seconds=None):
+        # Scrape stage: every case not yet in the store goes into it, one commit per case
         try:
             # Set Semaphore to limit concurrency
             max_concurrent_tasks = 15
             semaphore = asyncio.Semaphore(max_concurrent_tasks)
-            
-            # Load state if it exists
-            state = load_state()
-            if state:
-                case_scrapes = state['case_scrapes']
-                processed_cases = state['processed_cases']
-                logging.info("LOADED STATE FROM CHECKPOINT")
-            else:
-                # Initialize data stores if they do not exist in state
-                logging.info("NO CHECKPOINT FOUND - INITIALIZING FROM START")
-                case_scrapes = {}
-                processed_cases = set()
+
+            scraped_cases = self.store.scraped_case_names()
+            logging.info(f"{len(scraped_cases)} cases already in the scrape store")
 
             tasks = []
 
             # Process each course asynchronously
             logging.info("Starting async scraping of courses")
 
-            async def sem_scrape_case(case_name, course_url, case_scrapes):
-                async with semaphore:
-                    await self.scraper.scrape_case(case_name, course_url, case_scrapes)
+            deadline = None if budget_seconds is None else time.monotonic() + budget_seconds
 
-            for course_name, course_url in courses.items():
-                await self.scraper.navigate_to_repository(course_url)
-                await self.scraper.scroll_around()
+            async def sem_scrape_case(case_name, course_name, course_url):
+                async with semaphore:
+                    # Cases still waiting at the deadline are left unscraped for the next run
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return
+                    start = time.perf_counter()
+                    case_scrapes = await self.scraper.scrape_case(case_name, course_url, {})
+                if case_name in case_scrapes:
+                    self.store.save_scrape(case_name, course_name, course_url, **case_scrapes[case_name])
+                    self.store.record_latency(case_name, time.perf_counter() - start)
 
-                # Get case names from the repository
-                case_names = []
-                await self.scraper.get_case_names(course_url, course_name, case_names)
+            if deadline is not None:
+                await self.scrape_until_deadline(sem_scrape_case, deadline, max_concurrent_tasks)
+                return
 
-                counter = len(processed_cases)
+            # Each course's cases are scheduled as soon as its listing is parsed, while other listings still load
+            async for course_name, course_url, case_names in self.iter_course_listings():
+                counter = len(scraped_cases)
                 for case_name in case_names:
-                    if case_name not in case_scrapes:
-                        
-                        tasks.append(asyncio.create_task(sem_scrape_case(case_name, course_url, case_scrapes)))
-                        processed_cases.add(case_name)
-
-                        # Save periodically to avoid data loss
-                        if len(processed_cases) % 10 == 0:
-                            self.create_state(case_scrapes, processed_cases)
-                            logging.info(f"SAVED STATE after 10 more cases.")
-                logging.info(f"Added {len(processed_cases) - counter} case scraping tasks in {course_name}")
+                    if case_name not in scraped_cases:
+                        tasks.append(asyncio.create_task(sem_scrape_case(case_name, course_name, course_url)))
+                        scraped_cases.add(case_name)
+                logging.info(f"Added {len(scraped_cases) - counter} case scraping tasks in {course_name}")
 
             await asyncio.gather(*tasks)
+            logging.info(f"Finished case scraping tasks - page lease metrics: {self.scraper.page_leases.metrics}")
 
-            # Now that we have all the scrapes, process and update the Google Sheet
-            logging.info("Processing scraped data and updating Google Sheets")
-
-            await self.scraper.close_browser()
+        except Exception as e:
+            logging.error(f"Error in Coordinator:scrape_cases: {e}")
+
+    async def scrape_until_deadline(self, scrape_case, deadline, concurrency):
+        # The whole plan is needed to rank it, so list every course before the first scrape
+        plan = await self.plan_cases()
+        scheduler = CaseScheduler(self.store.scrape_latencies(), self.case_values(), concurrency)
+        scheduled, deferred = scheduler.schedule(plan, deadline - time.monotonic())
+
+        tasks = [asyncio.create_task(scrape_case(*entry)) for entry in scheduled]
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=max(0, deadline - time.monotonic()))
+        # Stop cleanly: cancelled scrapes close their leased pages, finished ones are already committed
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        scraped_cases = self.store.scraped_case_names()
+        remaining = [case_name for case_name, _, _ in plan if case_name not in scraped_cases]
+        logging.info(f"Deadline reached or plan finished: {len(plan) - len(remaining)} of {len(plan)} planned cases scraped, "
+                     f"{len(pending)} cancelled in flight, {len(remaining)} left for the next run")
+
+    def case_values(self):
+        # Value of a case: sheet rows it would fill (EK or EL still empty), then all sheet rows it feeds
+        if self.sheet_handler is None:
+            return {}
+        written_cells = self.sheet_handler.read_written_cells()
+        values = collections.defaultdict(lambda: [0, 0])
+        for course_row in self.sheet_handler.extract_course_data():
+            synopsis, full_text = written_cells.get(course_row.row, ("", ""))
+            value = values[course_row.case_name]
+            value[1] += 1
+            if not synopsis or (course_row.teaching_point and not full_text):
+                value[0] += 1
+        return {case_name: tuple(value) for case_name, value in values.items()}
+
+    async def iter_course_listings(self, course_urls=None):
+        # List courses concurrently on leased pages, one load per repository URL, yielding each as it finishes
+        max_concurrent_listings = 4
+        semaphore = asyncio.Semaphore(max_concurrent_listings)
+
+        async def list_course(course_name, course_url):
+            async with semaphore:
+                try:
+                    case_names = await self.scraper.list_case_names(course_url)
+                    logging.info(f"Extracted {len(case_names)} case names from course repository: {course_name}: {course_url}")
+                except Exception as e:
+                    logging.error(f"Error listing cases for {course_name}: {course_url} - {e}")
+                    case_names = []
+            return course_name, course_url, case_names
+
+        # Several course names share a repository URL, so the first name listed for it gets its cases
+        course_names_by_url = {}
+        for course_name, course_url in (course_urls or courses).items():
+            course_names_by_url.setdefault(course_url, course_name)
+        tasks = [asyncio.create_task(list_course(course_name, course_url)) for course_url, course_name in course_names_by_url.items()]
+        for listing in asyncio.as_completed(tasks):
+            yield await listing
+
+    async def plan_cases(self, course_urls=None):
+        # Case plan for the sharded mode: every listed case not yet in the store, as (case, course, course URL)
+        scraped_cases = self.store.scraped_case_names()
+        plan = []
+        async for course_name, course_url, case_names in self.iter_course_listings(course_urls):
+            for case_name in case_names:
+                if case_name not in scraped_cases:
+                    plan.append((case_name, course_name, course_url))
+                    scraped_cases.add(case_name)
+        logging.info(f"Planned {len(plan)} case scrapes across {len(course_urls or courses)} courses")
+        return plan
+
+    def parse_cases(self, workers=PARSE_WORKERS):
+        # Parse stage: parse every stored scrape across all cores, no browser or sheet needed; unchanged content hits the cache
+        case_names = sorted(self.store.scraped_case_names())
+        backend_name = get_html_backend().name
+        parse_cache = ParseCache()
+        start = time.perf_counter()
+        try:
+            with forward_worker_logs() as log_queue, \
+                    ProcessPoolExecutor(max_workers=workers, initializer=init_parse_worker, initargs=(self.store.path, backend_name, parse_cache.path, log_queue)) as pool:
+                parsed = list(pool.map(parse_stored_case, case_names, chunksize=max(1, len(case_names) // (workers * 4))))
+            results = [(case_name, synopsis, teaching_points) for case_name, synopsis, teaching_points, _, _ in parsed]
+            self.store.save_parses(results)
+            hit_keys = [content_key for _, _, _, content_key, hit in parsed if hit]
+            parse_cache.save([(content_key, synopsis, teaching_points) for _, synopsis, teaching_points, content_key, hit in parsed if not hit], hit_keys)
+        finally:
+            parse_cache.close()
+        elapsed = time.perf_counter() - start
+        logging.info(f"Parsed {len(results)} stored cases with {workers} workers in {elapsed:.1f}s ({len(hit_keys)} from the parse cache)")
+        return results
 
-            # Processing data from Google Sheets
+    def write_results(self):
+        # Write stage: match sheet rows against the stored parse results and push them to the sheet
+        try:
             course_data = self.sheet_handler.extract_course_data()
             case_synopsis_data = []
             teaching_point_data = []
-
-            for idx, row in enumerate(course_data):
-                case_name = row["Case Name"]
-                teaching_point_name = row["Teaching Point"]
-
-                synopsis = None
-                full_teaching_point = None
-
-                # Check if the case name has been scraped, if so parse the necessary data
-                if case_name in case_scrapes:
-                    clean_synopsis = self.scraper.parse_synopsis(case_scrapes[case_name])
-                    if clean_synopsis:
-                        synopsis = {"Row": idx + 2, "Case Name": case_name, "Case Synopsis": clean_synopsis}  # +2 for Google Sheets index
-
-                # Check if the teaching point needs to be parsed, if so parse it
-                if case_name in case_scrapes and teaching_point_name:
-                    clean_teaching_point = self.scraper.parse_teaching_point(case_scrapes[case_name], teaching_point_name)
-                    if clean_teaching_point:
-                        full_teaching_point = {"Row": idx + 2, "Teaching Point": teaching_point_name, "Full Text": clean_teaching_point}
-
-                if synopsis:
-                    case_synopsis_data.append(synopsis)
-
-                if full_teaching_point:
-                    teaching_point_data.append(full_teaching_point)
+            teaching_point_indexes = {}
+            match_report = []
+
+            for course_row in course_data:
+                case_name = course_row.case_name
+                teaching_point_name = course_row.teaching_point
+
+                clean_synopsis = self.store.get_synopsis(case_name)
+                if clean_synopsis:
+                    case_synopsis_data.append({"Row": course_row.row, "Case Name": case_name, "Case Synopsis": clean_synopsis})
+
+                if teaching_point_name:
+                    # Build each case's title index once and reuse it for all of the case's rows
+                    if case_name not in teaching_point_indexes:
+                        teaching_points = self.store.get_teaching_points(case_name)
+                        teaching_point_indexes[case_name] = (teaching_points, TeachingPointIndex(teaching_points))
+                    teaching_points, index = teaching_point_indexes[case_name]
+                    match = index.match(teaching_point_name)
+                    match_report.append((course_row.row, case_name, teaching_point_name, match.title or "", f"{match.confidence:.3f}", match.method))
+                    if match.method in TP_MATCH_WRITE_METHODS:
+                        teaching_point_data.append({"Row": course_row.row, "Teaching Point": teaching_point_name, "Full Text": teaching_points[match.title]})
+
+            self.write_match_report(match_report)
 
             # Write data back to Google Sheets
             if case_synopsis_data:
@@ -565,71 +1595,832 @@ class Coordinator:
             logging.info("Data successfully written back to Google Sheets")
 
         except Exception as e:
-            logging.error(f"Error in Coordinator:process_cases: {e}")
+            logging.error(f"Error in Coordinator:write_results: {e}")
+
+    def write_match_report(self, match_report):
+        # Match confidence for every sheet row with a teaching point
+        with open(TP_MATCH_REPORT_FILE, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Row", "Case", "Teaching Point", "Matched Title", "Confidence", "Method"])
+            writer.writerows(match_report)
+        methods = collections.Counter(entry[5] for entry in match_report)
+        logging.info(f"Teaching point matches written to {TP_MATCH_REPORT_FILE}: {dict(methods)}")
+
+    async def process_cases(self, budget_seconds=None):
+        # All three stages in sequence, profiled when MEMORY_PROFILE=1
+        profiler = MemoryProfiler()
+        profiler.start()
+        try:
+            with profiler.stage("scrape"):
+                # A run budget leaves DEADLINE_RESERVE_SECONDS for parsing and writing what was scraped
+                await self.scrape_cases(None if budget_seconds is None else max(0, budget_seconds - DEADLINE_RESERVE_SECONDS))
+            with profiler.stage("close browser"):
+                await self.scraper.close_browser()
+            # Parsing runs in worker processes, so this stage traces only the parent's share
+            with profiler.stage("parse"):
+                self.parse_cases()
+            with profiler.stage("write"):
+                self.write_results()
+        finally:
+            profiler.stop()
+
+
+async def login(scraper, credentials):
+    Org_UN, Org_PW = credentials
+
+    # Navigate to initial login page
+    logging.info("Navigating to initial login page")
+    await scraper.attempt_login_page(Org_UN, Org_PW)
+
+    # 2FA Authentication
+    logging.info("Running 2FA authentication")
+    code = await scraper.get_2fa_code(Org_UN, Org_PW)
+    logging.info(f"2FA code retrieved from email: {code}")
+    if not code:
+        logging.info("Fallback to manual entry for 2FA code")
+        code = input("Please enter the 2FA code: ")
+        logging.info(f"2FA code received from user: {code}")
+    if not code:
+        raise Exception("2FA code is not retrieved properly")
+
+    # Input 2FA code (Assuming input field locator is known)
+    await scraper.page.wait_for_load_state("domcontentloaded", timeout=10000)
+    logging.info(f"Arrived at 2FA page: {scraper.page.url}")
+    await scraper.page.get_by_label("Please enter the time-").fill(code)
+   
+    # Attempt manual submission with short timeouts
+    try:
+        await scraper.page.locator("input[type=submit]").first.click(timeout=1000)
+        logging.info("Clicked submit button on 2FA page using CSS Selector")
+    except Exception as e:
+        logging.info(f"Failed to submit 2FA code for Org sign-in: {e}")
+        try:
+            await scraper.page.get_by_text("submit").click(timeout=1000)
+            logging.info("Clicked submit on 2FA page using get_by_text method")
+        except Exception as e:
+            logging.error(f"Failed to click submit using fallback: {e}")
+        # await scraper.page.locator(scraper.page, "input[type=submit]", """//*[@id="sign_in_form"]/div/div/div/input""", "commit", "input")
 
+    # wait for page redirect with or without successful click, confirm proper navigation
+    try:
+        await scraper.page.wait_for_url("https://placeholder.org.com", timeout=10000)
+        await scraper.page.wait_for_load_state("domcontentloaded", timeout=10000)
+    except Exception as e:
+        logging.error(f"Error while waiting for target URL or load state: {e}")
+
+
+# Curriculum Dashboard sheet and the service account used to reach it
+SPREADSHEET_ID = "1dpK7QX-MtHgVV1lpH1ZFR4FpOxFtOz2QHxB1tASgFNY"
+GOOGLE_CREDENTIALS_FILE = "GoogleCloudCredentials.json"
+
+
+async def start_scraper():
+    scraper = WebScraper(base_url=BASE_URL)
+    await scraper.setup_browser()
 
-async def main():
+    # Skip the login and 2FA flow when the browser daemon's session is still signed in
+    if scraper.daemon_connected and await scraper.is_authenticated():
+        logging.info("Reusing authenticated session from browser daemon")
+    else:
+        await login(scraper, load_org_credentials())
+
+    logging.info("Finished login steps, proceeding to Coordinator async methods")
+    return scraper
+
+
+async def main(budget_seconds=None):
     # Set up your Google Sheet credentials and initialize the handler
-    sheet_handler = GoogleSheetHandler(spreadsheet_id="1dpK7QX-MtHgVV1lpH1ZFR4FpOxFtOz2QHxB1tASgFNY", credentials="GoogleCloudCredentials.json")
+    sheet_handler = GoogleSheetHandler(spreadsheet_id=SPREADSHEET_ID, credentials=GOOGLE_CREDENTIALS_FILE)
+    store = ScrapeStore()
+
+    try:
+        scraper = await start_scraper()
+        coordinator = Coordinator(store, sheet_handler, scraper)
+
+        logging.info("Processing cases with the coordinator class")
    
-    scraper = WebScraper(base_url="https://placeholder.org.com")
-    await scraper.setup_browser()
+        await coordinator.process_cases(budget_seconds)
+   
+    except Exception as e:
+        logging.error(f"Error in main method try block: {e}")
+    finally:
+        store.close()
+
+
+async def scrape_stage(budget_seconds=None):
+    store = ScrapeStore()
+    scraper = None
+    try:
+        # The sheet is only needed to rank cases for a budgeted scrape
+        sheet_handler = None if budget_seconds is None else GoogleSheetHandler(spreadsheet_id=SPREADSHEET_ID, credentials=GOOGLE_CREDENTIALS_FILE)
+        scraper = await start_scraper()
+        await Coordinator(store, sheet_handler, scraper).scrape_cases(budget_seconds)
+    except Exception as e:
+        logging.error(f"Error in scrape stage: {e}")
+    finally:
+        if scraper is not None:
+            await scraper.close_browser()
+        store.close()
 
+
+def parse_stage(workers):
+    store = ScrapeStore()
     try:
+        results = Coordinator(store).parse_cases(workers)
+        print(f"Parsed {len(results)} stored cases into {store.path}")
+    finally:
+        store.close()
 
-        # Navigate to initial login page
-        logging.info("Navigating to initial login page")
-        await scraper.attempt_login_page()
-
-        # 2FA Authentication
-        logging.info("Running 2FA authentication")
-        code = await scraper.get_2fa_code(Org_UN, Org_PW)
-        logging.info(f"2FA code retrieved from email: {code}")
-        if not code:
-            logging.info("Fallback to manual entry for 2FA code")
-            code = input("Please enter the 2FA code: ")
-            logging.info(f"2FA code received from user: {code}")
-        if not code:
-            raise Exception("2FA code is not retrieved properly")
-
-        # Input 2FA code (Assuming input field locator is known)
-        await scraper.page.wait_for_load_state("domcontentloaded", timeout=10000)
-        logging.info(f"Arrived at 2FA page: {scraper.page.url}")
-        await scraper.page.get_by_label("Please enter the time-").fill(code)
-       
-        # Attempt manual submission with short timeouts
+
+def write_stage():
+    sheet_handler = GoogleSheetHandler(spreadsheet_id=SPREADSHEET_ID, credentials=GOOGLE_CREDENTIALS_FILE)
+    store = ScrapeStore()
+    try:
+        Coordinator(store, sheet_handler).write_results()
+    finally:
+        store.close()
+
+
+def dry_run():
+    # Read the sheet and report the scrape plan without starting a browser
+    sheet_handler = GoogleSheetHandler(spreadsheet_id=SPREADSHEET_ID, credentials=GOOGLE_CREDENTIALS_FILE)
+    course_data = sheet_handler.extract_course_data()
+    log_time_to_first_work("dry run sheet read")
+
+    store = ScrapeStore()
+    scraped_cases = store.scraped_case_names()
+    store.close()
+    cases_by_course = collections.defaultdict(set)
+    for course_row in course_data:
+        cases_by_course[course_row.course].add(course_row.case_name)
+
+    print(f"{len(course_data)} rows, {sum(len(cases) for cases in cases_by_course.values())} unique cases")
+    for course_name, case_names in sorted(cases_by_course.items()):
+        known = "" if course_name in courses else " (no course URL)"
+        print(f"{course_name or '<blank>'}: {len(case_names)} cases, {len(case_names - scraped_cases)} not yet scraped{known}")
+
+
+# Sharded scraping: K processes, each with its own browser and event loop, scrape a slice of the case plan
+# One shard (the default) keeps the single-process scrape; 4 is a good start for sharding
+SCRAPE_SHARDS = int(os.environ.get("SCRAPE_SHARDS", 1))
+SHARD_CONCURRENCY = int(os.environ.get("SHARD_CONCURRENCY", 4))
+
+async def run_shard(plan, results, storage_state, deadline=None):
+    # deadline is wall-clock time.time(), which the spawned shards and the parent share
+    scraper = WebScraper(base_url=BASE_URL)
+    await scraper.setup_browser(storage_state=storage_state, use_daemon=False)
+    semaphore = asyncio.Semaphore(SHARD_CONCURRENCY)
+
+    async def shard_scrape_case(case_name, course_name, course_url):
+        async with semaphore:
+            # Cases still waiting at the deadline are left unscraped for the next run
+            if deadline is not None and time.time() >= deadline:
+                return
+            start = time.perf_counter()
+            case_scrapes = await scraper.scrape_case(case_name, course_url, {})
+        results.put((case_name, course_name, course_url, case_scrapes.get(case_name), time.perf_counter() - start))
+
+    try:
+        tasks = [asyncio.create_task(shard_scrape_case(*entry)) for entry in plan]
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=None if deadline is None else max(0, deadline - time.time()))
+        # Stop cleanly at the deadline: cancelled scrapes close their leased pages
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        logging.info(f"Shard finished {len(plan) - len(pending)} of {len(plan)} cases - page lease metrics: {scraper.page_leases.metrics}")
+    finally:
+        await scraper.close_browser()
+
+# Each shard's last message: its id and the error that ended it, if any
+ShardExit = namedtuple("ShardExit", ["shard_id", "error"])
+
+def scrape_shard(shard_id, plan, results, storage_state, deadline=None):
+    # Spawned processes start without the parent's log listener, so each writes its own log
+    setup_logging(f"scrape_cd-shard{shard_id}.log")
+    error = None
+    try:
+        asyncio.run(run_shard(plan, results, storage_state, deadline))
+    except Exception as e:
+        logging.error(f"Error in scrape shard {shard_id}: {e}")
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        # The parent waits for one ShardExit per shard
+        results.put(ShardExit(shard_id, error))
+
+def scrape_sharded(store, plan, shards, storage_state=None, deadline=None):
+    # Only the parent writes to the store; shards send each scrape back through the result queue
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=scrape_shard, args=(shard_id, plan[shard_id::shards], results, storage_state, deadline)) for shard_id in range(shards)]
+    for worker in workers:
+        worker.start()
+
+    saved = 0
+    finished = 0
+    errors = []
+    while finished < len(workers):
         try:
-            await scraper.page.locator("input[type=submit]").first.click(timeout=1000)
-            logging.info("Clicked submit button on 2FA page using CSS Selector")
-        except Exception as e:
-            logging.info(f"Failed to submit 2FA code for Org sign-in: {e}")
+            result = results.get(timeout=5)
+        except queue.Empty:
+            # A shard killed outright never sends its ShardExit
+            if not any(worker.is_alive() for worker in workers):
+                errors.append(f"{len(workers) - finished} shards exited without reporting")
+                break
+            continue
+        if isinstance(result, ShardExit):
+            finished += 1
+            if result.error is not None:
+                errors.append(f"shard {result.shard_id}: {result.error}")
+            continue
+        case_name, course_name, course_url, case_scrape, seconds = result
+        if case_scrape is None:
+            logging.error(f"No content scraped for case {case_name}, it stays unscraped for the next run")
+            continue
+        store.save_scrape(case_name, course_name, course_url, **case_scrape)
+        store.record_latency(case_name, seconds)
+        saved += 1
+
+    for worker in workers:
+        worker.join()
+    # Scrapes from the other shards are already saved; the caller still has to hear that the plan was cut short
+    if errors:
+        raise Exception(f"{len(errors)} of {shards} shards failed after {saved} cases were saved: {'; '.join(errors)}")
+    return saved
+
+async def plan_sharded_scrape(store, shards, deadline=None):
+    # With a deadline the plan is ranked by sheet value and cut to what all shards are predicted to finish
+    sheet_handler = None if deadline is None else GoogleSheetHandler(spreadsheet_id=SPREADSHEET_ID, credentials=GOOGLE_CREDENTIALS_FILE)
+    scraper = await start_scraper()
+    try:
+        coordinator = Coordinator(store, sheet_handler, scraper)
+        plan = await coordinator.plan_cases()
+        if deadline is not None:
+            scheduler = CaseScheduler(store.scrape_latencies(), coordinator.case_values(), shards * SHARD_CONCURRENCY)
+            plan, _ = scheduler.schedule(plan, deadline - time.time())
+        # Shards start from this session instead of each logging in
+        await save_storage_state(scraper.context)
+    finally:
+        await scraper.close_browser()
+    return plan
+
+def sharded_scrape_stage(shards, budget_seconds=None):
+    store = ScrapeStore()
+    try:
+        deadline = None if budget_seconds is None else time.time() + budget_seconds
+        plan = asyncio.run(plan_sharded_scrape(store, shards, deadline))
+        start = time.perf_counter()
+        saved = scrape_sharded(store, plan, shards, AUTH_STATE_FILE, deadline)
+        elapsed = time.perf_counter() - start
+        logging.info(f"Scraped {saved}/{len(plan)} cases with {shards} shards in {elapsed:.1f}s")
+    except Exception as e:
+        logging.error(f"Error in sharded scrape stage: {e}")
+    finally:
+        remove_storage_state()
+        store.close()
+
+
+# Queue workers: any number of processes on this host pull courses and cases from the work queue
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", 2))
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", 4))
+AUTH_STATE_FILE = os.environ.get("AUTH_STATE_FILE", "auth-state.json")
+SCRAPE_QUEUES = ("courses", "cases")
+
+# The saved session holds live login cookies, so only this user may read it and it is removed once the run finishes
+async def save_storage_state(context, path=AUTH_STATE_FILE):
+    state = await context.storage_state()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        # O_CREAT keeps the mode of a file left by an older run
+        os.chmod(path, 0o600)
+        json.dump(state, f)
+
+def remove_storage_state(work_queue=None, path=AUTH_STATE_FILE):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+    # The next queue workers log in again instead of looking for the removed session
+    if work_queue is not None:
+        work_queue.requeue("auth", "session")
+
+def enqueue_courses(work_queue):
+    # A new plan logs in again and re-lists every course; cases already in the store are not queued again
+    work_queue.put("auth", "session")
+    work_queue.requeue("auth", "session")
+    for course_name, course_url in courses.items():
+        work_queue.put("courses", course_name, {"course_url": course_url})
+        work_queue.requeue("courses", course_name)
+    logging.info(f"Queued {len(courses)} courses in {work_queue.path}")
+
+async def keep_lease(work_queue, item, owner):
+    while True:
+        await asyncio.sleep(work_queue.lease_seconds / 3)
+        if not work_queue.heartbeat(item, owner):
+            logging.error(f"Lost the lease on {item.queue} item {item.key}, another worker may pick it up")
+            return
+
+async def start_worker_scraper(work_queue, owner):
+    # The first worker to lease the login item signs in and saves the session for the others
+    scraper = WebScraper(base_url=BASE_URL)
+    while True:
+        item = work_queue.lease("auth", owner)
+        if item is not None:
             try:
-                await scraper.page.get_by_text("submit").click(timeout=1000)
-                logging.info("Clicked submit on 2FA page using get_by_text method")
+                await scraper.setup_browser(use_daemon=False)
+                await login(scraper, load_org_credentials())
+                await save_storage_state(scraper.context)
             except Exception as e:
-                logging.error(f"Failed to click submit using fallback: {e}")
-            # await scraper.page.locator(scraper.page, "input[type=submit]", """//*[@id="sign_in_form"]/div/div/div/input""", "commit", "input")
+                work_queue.fail(item, owner, str(e))
+                raise
+            work_queue.complete(item, owner)
+            logging.info(f"{owner} logged in and saved the session to {AUTH_STATE_FILE}")
+            return scraper
+
+        status = work_queue.status("auth", "session")
+        if status == "done":
+            await scraper.setup_browser(storage_state=AUTH_STATE_FILE, use_daemon=False)
+            logging.info(f"{owner} reusing the saved session from {AUTH_STATE_FILE}")
+            return scraper
+        if status not in ("pending", "leased"):
+            raise Exception(f"Shared login is {status}, run the enqueue subcommand first")
+        # Another worker is logging in; if it dies its lease expires and this loop takes over
+        await asyncio.sleep(2)
 
-        # wait for page redirect with or without successful click, confirm proper navigation
+async def work_items(work_queue, store, scraper, owner):
+    while True:
+        # Finish known cases before listing more courses
+        item = work_queue.lease("cases", owner) or work_queue.lease("courses", owner)
+        if item is None:
+            if work_queue.outstanding(SCRAPE_QUEUES) == 0:
+                return
+            await asyncio.sleep(2)
+            continue
+
+        heartbeat = asyncio.create_task(keep_lease(work_queue, item, owner))
         try:
-            await scraper.page.wait_for_url("https://placeholder.org.com", timeout=10000)
-            await scraper.page.wait_for_load_state("domcontentloaded", timeout=10000)
+            if item.queue == "courses":
+                case_names = await scraper.list_case_names(item.payload["course_url"])
+                scraped_cases = store.scraped_case_names()
+                for case_name in case_names:
+                    if case_name not in scraped_cases:
+                        work_queue.put("cases", case_name, {"course": item.key, "course_url": item.payload["course_url"]})
+                logging.info(f"{owner} listed {len(case_names)} cases in {item.key}")
+            else:
+                case_scrapes = await scraper.scrape_case(item.key, item.payload["course_url"], {})
+                if item.key not in case_scrapes:
+                    raise Exception("no content scraped")
+                store.save_scrape(item.key, item.payload["course"], item.payload["course_url"], **case_scrapes[item.key])
+            work_queue.complete(item, owner)
         except Exception as e:
-            logging.error(f"Error while waiting for target URL or load state: {e}")
-
-
-        logging.info("Finished login steps, proceeding to Coordinator async methods")
+            logging.error(f"{owner} failed {item.queue} item {item.key} (attempt {item.attempts}): {e}")
+            work_queue.fail(item, owner, str(e))
+        finally:
+            heartbeat.cancel()
 
+async def run_worker(worker_id):
+    work_queue = WorkQueue()
+    store = ScrapeStore()
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    scraper = None
+    try:
+        scraper = await start_worker_scraper(work_queue, owner)
+        # Each slot leases its own items, so each gets its own lease owner
+        await asyncio.gather(*(work_items(work_queue, store, scraper, f"{owner}:{slot}") for slot in range(WORKER_CONCURRENCY)))
+        logging.info(f"Worker {worker_id} found no outstanding work - page lease metrics: {scraper.page_leases.metrics}")
+    except Exception as e:
+        logging.error(f"Error in worker {worker_id}: {e}")
+    finally:
+        if scraper is not None:
+            await scraper.close_browser()
+        store.close()
+        work_queue.close()
+
+def worker_process(worker_id):
+    # Spawned processes start without the parent's log listener, so each writes its own log
+    setup_logging(f"scrape_cd-worker{worker_id}.log")
+    asyncio.run(run_worker(worker_id))
+
+def run_workers(processes):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=worker_process, args=(worker_id,)) for worker_id in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    work_queue = WorkQueue()
+    try:
+        remove_storage_state(work_queue)
+    finally:
+        work_queue.close()
 
-        coordinator = Coordinator(sheet_handler, scraper)
+def print_queue_status():
+    work_queue = WorkQueue()
+    try:
+        for queue_name, status, count in work_queue.counts():
+            print(f"{queue_name:10} {status:8} {count}")
+    finally:
+        work_queue.close()
+
+
+# Case corpus export for reporting tools: one row per case, fingerprints instead of the raw HTML
+CASE_EXPORT_PREFIX = "case-corpus"
+CASE_EXPORT_BATCH_SIZE = 500
+
+def document_set_id(course_url):
+    match = re.search(r"/document_sets/(\d+)", course_url or "")
+    return int(match.group(1)) if match else None
+
+def to_utc(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc) if timestamp is not None else None
+
+def iter_case_records(store):
+    teaching_points = store.teaching_points_by_case()
+    for case_name, course, course_url, html_content, text_content, scraped_at, synopsis, parsed_at in store.iter_cases():
+        yield {
+            "case_name": case_name,
+            "course": course,
+            "document_set_id": document_set_id(course_url),
+            "synopsis": synopsis,
+            "teaching_points": teaching_points.get(case_name, []),
+            "html_fingerprint": hashlib.sha256((html_content or "").encode("utf-8")).hexdigest(),
+            "text_fingerprint": hashlib.sha256((text_content or "").encode("utf-8")).hexdigest(),
+            "scraped_at": to_utc(scraped_at),
+            "parsed_at": to_utc(parsed_at)
+        }
 
-        logging.info("Processing cases with the coordinator class")
-   
-        await coordinator.process_cases()
-   
-    except Exception as e:
-        logging.error(f"Error in main method try block: {e}")
+def case_export_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("case_name", pa.string()),
+        ("course", pa.string()),
+        ("document_set_id", pa.int64()),
+        ("synopsis", pa.string()),
+        ("teaching_points", pa.list_(pa.struct([("title", pa.string()), ("full_text", pa.string())]))),
+        ("html_fingerprint", pa.string()),
+        ("text_fingerprint", pa.string()),
+        ("scraped_at", pa.timestamp("ms", tz="UTC")),
+        ("parsed_at", pa.timestamp("ms", tz="UTC"))
+    ])
+
+def export_case_corpus(store, prefix=CASE_EXPORT_PREFIX, formats=("parquet", "jsonl")):
+    # Single pass over the store, writing Parquet (zstd) in row groups and JSONL line by line
+    parquet_writer = jsonl_file = None
+    schema = None
+    if "parquet" in formats:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = case_export_schema()
+        parquet_writer = pq.ParquetWriter(f"{prefix}.parquet", schema, compression="zstd")
+    if "jsonl" in formats:
+        jsonl_file = open(f"{prefix}.jsonl", "w", encoding="utf-8")
+
+    count = 0
+    batch = []
+    try:
+        for record in iter_case_records(store):
+            count += 1
+            if jsonl_file:
+                jsonl_file.write(json.dumps(record, default=lambda value: value.isoformat()) + "\n")
+            if parquet_writer:
+                batch.append(record)
+                if len(batch) >= CASE_EXPORT_BATCH_SIZE:
+                    parquet_writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+        if parquet_writer and batch:
+            parquet_writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    finally:
+        if parquet_writer:
+            parquet_writer.close()
+        if jsonl_file:
+            jsonl_file.close()
+
+    logging.info(f"Exported {count} cases to {prefix} as {', '.join(formats)}")
+    return count
+
+def load_case_corpus(path=f"{CASE_EXPORT_PREFIX}.parquet", columns=None):
+    # Memory-mapped read of only the requested columns, e.g. ["case_name", "synopsis"]
+    import pyarrow.parquet as pq
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+# Sanitized case pages and synopsis texts committed next to the script for the equivalence checks
+SAMPLE_PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_pages")
+SAMPLE_TEXTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_texts")
+
+def load_saved_pages(source):
+    # Saved case pages come from a directory of .html files or from the scrape store
+    if source and os.path.isdir(source):
+        pages = {}
+        for path in sorted(glob.glob(os.path.join(source, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages[os.path.basename(path)] = f.read()
+        return pages
+
+    store = ScrapeStore()
+    pages = dict(store.iter_scrapes("html_content"))
+    store.close()
+    if not pages:
+        raise FileNotFoundError(f"No saved pages found in {source} and none in the scrape store at {SCRAPE_STORE_FILE}")
+    return pages
+
+def extract_page_content(backend, html_content):
+    # Everything the scraper pulls out of a page: case names plus each teaching point's text
+    scraper = WebScraper(base_url=BASE_URL, html_backend=backend)
+    root = backend.parse(html_content)
+    content = {"case_names": scraper.extract_case_names(html_content), "teaching_points": {}}
+    for title in backend.teaching_point_titles(root):
+        if title not in content["teaching_points"]:
+            content["teaching_points"][title] = scraper.parse_teaching_point({"html_content": html_content}, title)
+    return content
+
+def compare_html_backends(source):
+    # Equivalence check: every backend must extract identical text to the html.parser reference
+    pages = load_saved_pages(source)
+    reference_backend = HtmlBackend()
+    references = {page_name: extract_page_content(reference_backend, html) for page_name, html in pages.items()}
+    mismatches = []
+    for backend in available_html_backends():
+        for page_name, html in pages.items():
+            content = extract_page_content(backend, html)
+            if content["case_names"] != references[page_name]["case_names"]:
+                mismatches.append((backend.name, page_name, "case names"))
+            for title, text in references[page_name]["teaching_points"].items():
+                if content["teaching_points"].get(title) != text:
+                    mismatches.append((backend.name, page_name, f"teaching point '{title}'"))
+        print(f"{backend.name}: compared {len(pages)} pages")
+
+    for backend_name, page_name, field in mismatches:
+        print(f"MISMATCH {backend_name}: {page_name} - {field}")
+    print(f"{len(mismatches)} mismatches across {len(pages)} saved pages")
+    return not mismatches
+
+def benchmark_html_backends(source, repeat=3):
+    # Micro-benchmark of pages/sec per backend over the same parse and extraction work
+    pages = list(load_saved_pages(source).values())
+    results = {}
+    for backend in available_html_backends():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for html_content in pages:
+                root = backend.parse(html_content)
+                [backend.get_text(element) for element in backend.select(root, CASE_NAME_SELECTOR)]
+                for section in backend.select(root, DOC_SECTION_SELECTOR):
+                    body = backend.select_first(section, TP_BODY_SELECTOR)
+                    if body is not None:
+                        backend.get_text(body, separator="\n")
+        elapsed = time.perf_counter() - start
+        results[backend.name] = len(pages) * repeat / elapsed if elapsed else float("inf")
+        print(f"{backend.name}: {results[backend.name]:.1f} pages/sec")
+    return results
+
+def load_saved_texts(source):
+    # Golden corpus of page text: a directory of .txt files or the scrape store's text_content
+    if source and os.path.isdir(source):
+        texts = {}
+        for path in sorted(glob.glob(os.path.join(source, "*.txt"))):
+            with open(path, encoding="utf-8") as f:
+                texts[os.path.basename(path)] = f.read()
+        return texts
+
+    store = ScrapeStore()
+    texts = {case_name: text_content or "" for case_name, text_content in store.iter_scrapes("text_content")}
+    store.close()
+    if not texts:
+        raise FileNotFoundError(f"No saved texts found in {source} and none in the scrape store at {SCRAPE_STORE_FILE}")
+    return texts
+
+# Fuzz alphabet: every character class and header the normalizer rules look at, plus non-ASCII text
+NORMALIZER_FUZZ_TOKENS = list("aAbBzZ.?:)(1290 \n\t\xa0\u00e9\u0663") + [
+    "Case Synopsis", "Teaching Point", "CASE SYNOPSIS", "TEACHING POINT", "a.", "1.", "12.", "c)", "Case SynopsisCase Synopsis"]
+
+def fuzz_texts(count, seed=7):
+    # Seeded random strings, so a fuzz run is reproducible from its count and seed
+    generator = random.Random(seed)
+    for index in range(count):
+        yield f"fuzz-{index}", "".join(generator.choice(NORMALIZER_FUZZ_TOKENS) for _ in range(generator.randint(0, 60)))
+
+def compare_text_normalizer(source, fuzz=0, seed=7):
+    # normalize_text_content must be byte-identical to the original eleven-pass implementation
+    texts = list(load_saved_texts(source).items())
+    mismatches = [name for name, text in itertools.chain(texts, fuzz_texts(fuzz, seed))
+                  if normalize_text_content(text) != reference_clean_text_content(text)]
+    for name in mismatches[:20]:
+        print(f"MISMATCH: {name}")
+    print(f"{len(mismatches)} mismatches across {len(texts)} corpus texts and {fuzz} fuzzed strings (seed {seed})")
+    return not mismatches
+
+def benchmark_text_normalizer(source, sizes=(3_000, 1_000_000)):
+    # Throughput of both implementations, and the speed-up, on synopses of each size built from the corpus
+    corpus = "".join(load_saved_texts(source).values())
+    if not corpus:
+        raise ValueError("Golden corpus is empty")
+    results = {}
+    for size in sizes:
+        synopsis = (corpus * (size // len(corpus) + 1))[:size]
+        # About 3M characters per implementation, so short synopses are timed over many calls
+        repeat = max(3, 3_000_000 // size)
+        rates = {}
+        for normalizer in (reference_clean_text_content, normalize_text_content):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                normalizer(synopsis)
+            elapsed = (time.perf_counter() - start) / repeat
+            rates[normalizer.__name__] = len(synopsis) / elapsed / 1_000_000
+            print(f"{size} chars, {normalizer.__name__}: {rates[normalizer.__name__]:.2f} M chars/sec")
+        speedup = rates["normalize_text_content"] / rates["reference_clean_text_content"]
+        print(f"{size} chars: normalize_text_content is {speedup:.2f}x the reference")
+        results[size] = rates
+    return results
+
+# View-mode control for saved pages that were captured without one
+MOCK_VIEW_MODE_SELECT = '<select class="doc-controls-select doc-controls-view-mode"><option value="summary">Summary</option><option value="full">Full</option></select>'
+
+
+class MockCaseSite:
+    # Local stand-in for the case repository: saved case pages behind generated course listings
+    def __init__(self, pages, course_count=4, latency=0.0):
+        self.pages = {}
+        for page_name, html_content in pages.items():
+            # Saved listing pages (links to cases) are not cases; the site generates its own listings
+            if "case-name-link" in html_content:
+                continue
+            if "doc-controls-view-mode" not in html_content:
+                html_content = re.sub(r"<body[^>]*>", lambda match: match.group(0) + MOCK_VIEW_MODE_SELECT, html_content, count=1)
+            self.pages[os.path.splitext(page_name)[0]] = html_content
+        self.course_count = course_count
+        self.latency = latency
+        self.server = None
+
+    def listing(self, course_id):
+        links = "".join(
+            f'<a class="case-name-link case-name-container" href="/document_set_document_relations/{index}">{case_name}</a>'
+            for index, case_name in enumerate(self.pages) if index % self.course_count == course_id
+        )
+        return f"<html><body>{links}</body></html>"
+
+    def start(self):
+        site = self
+        case_pages = list(self.pages.values())
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(site.latency)
+                kind, _, key = self.path.strip("/").partition("/")
+                if kind == "document_sets" and key.isdigit():
+                    body = site.listing(int(key))
+                elif kind == "document_set_document_relations" and key.isdigit() and int(key) < len(case_pages):
+                    body = case_pages[int(key)]
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def plan(self, base_url):
+        # Same (case, course, course URL) entries Coordinator.plan_cases would list from the site
+        return [(case_name, f"Mock {index % self.course_count}", f"{base_url}/document_sets/{index % self.course_count}")
+                for index, case_name in enumerate(self.pages)]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def benchmark_scrape_shards(source, shard_counts, latency):
+    # Cases/minute for each shard count against the mock site, each run into a fresh scrape store
+    site = MockCaseSite(load_saved_pages(source), latency=latency)
+    if not site.pages:
+        raise FileNotFoundError(f"No case pages found in {source or SCRAPE_STORE_FILE}")
+    base_url = site.start()
+    plan = site.plan(base_url)
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for shards in shard_counts:
+                store = ScrapeStore(os.path.join(tmp, f"shards-{shards}.sqlite3"))
+                start = time.perf_counter()
+                saved = scrape_sharded(store, plan, shards)
+                elapsed = time.perf_counter() - start
+                store.close()
+                results[shards] = saved / elapsed * 60
+                print(f"{shards} shards x {SHARD_CONCURRENCY} pages: {saved}/{len(plan)} cases in {elapsed:.1f}s, {results[shards]:.1f} cases/min")
+    finally:
+        site.stop()
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape case content and write it back to the Curriculum Dashboard sheet.")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    run_parser = subparsers.add_parser("run", help="scrape, parse and write in one go (default)")
+    run_parser.add_argument("--budget", type=float, metavar="MINUTES",
+                            help="finish within this many minutes, scraping the most valuable cases first")
+    scrape_parser = subparsers.add_parser("scrape", help="scrape cases not yet in the scrape store")
+    scrape_parser.add_argument("--dry-run", action="store_true",
+                               help="read the sheet and report what would be scraped, without a browser")
+    scrape_parser.add_argument("--budget", type=float, metavar="MINUTES",
+                               help="stop after this many minutes, scraping the most valuable cases first")
+    scrape_parser.add_argument("--shards", type=int, default=SCRAPE_SHARDS,
+                               help="browser processes to shard the case plan across (default: %(default)s, from SCRAPE_SHARDS; 4 is a good start)")
+    parse_parser = subparsers.add_parser("parse", help="re-parse every stored case scrape across all cores")
+    parse_parser.add_argument("--workers", type=int, default=PARSE_WORKERS, help="parse processes (default: %(default)s)")
+    subparsers.add_parser("write", help="write the stored parse results to the sheet")
+    export_parser = subparsers.add_parser("export", help="export the stored case corpus to Parquet (zstd) and JSONL")
+    export_parser.add_argument("--format", choices=["parquet", "jsonl", "both"], default="both")
+    export_parser.add_argument("--output", default=CASE_EXPORT_PREFIX, help="output path without extension (default: %(default)s)")
+    subparsers.add_parser("enqueue", help="queue every course for the queue workers")
+    worker_parser = subparsers.add_parser("worker", help="scrape queued courses and cases into the scrape store")
+    worker_parser.add_argument("--processes", type=int, default=WORKER_PROCESSES, help="worker processes, each with its own browser (default: %(default)s)")
+    subparsers.add_parser("queue-status", help="count work items by queue and status")
+    subparsers.add_parser("browser-daemon",
+                          help="run a warm, logged-in browser that later runs of both scripts connect to "
+                               "(needs BROWSER_DAEMON=1; its CDP port is open to every local process)")
+    compare_html = subparsers.add_parser("compare-html-backends",
+                                         help="check all HTML parser backends extract identical text from saved pages")
+    compare_html.add_argument("pages", nargs="?", default=SAMPLE_PAGES_DIR,
+                              help="directory of .html files, or 'store' for the scrape store (default: the committed sample_pages)")
+    benchmark_html = subparsers.add_parser("benchmark-html-backends", help="measure pages/sec per HTML parser backend over saved pages")
+    benchmark_html.add_argument("pages", nargs="?", default=SAMPLE_PAGES_DIR,
+                                help="directory of .html files, or 'store' for the scrape store (default: the committed sample_pages)")
+    compare_normalizer = subparsers.add_parser("compare-normalizer",
+                                               help="check the single-pass normalizer matches the original on a golden corpus")
+    compare_normalizer.add_argument("texts", nargs="?", default=SAMPLE_TEXTS_DIR,
+                                    help="directory of .txt files, or 'store' for the scrape store (default: the committed sample_texts)")
+    compare_normalizer.add_argument("--fuzz", type=int, default=0, metavar="N", help="also compare N seeded random strings")
+    compare_normalizer.add_argument("--seed", type=int, default=7, help="fuzz seed (default: %(default)s)")
+    benchmark_normalizer = subparsers.add_parser("benchmark-normalizer", help="measure normalizer throughput on large synopses built from the corpus")
+    benchmark_normalizer.add_argument("texts", nargs="?", default=SAMPLE_TEXTS_DIR,
+                                      help="directory of .txt files, or 'store' for the scrape store (default: the committed sample_texts)")
+    benchmark_shards = subparsers.add_parser("benchmark-shards", help="measure cases/min per shard count on a local mock site built from saved pages")
+    benchmark_shards.add_argument("pages", nargs="?", default=SAMPLE_PAGES_DIR,
+                                  help="directory of .html files, or 'store' for the scrape store (default: the committed sample_pages)")
+    benchmark_shards.add_argument("--shards", default="1,2,4", help="comma-separated shard counts (default: %(default)s)")
+    benchmark_shards.add_argument("--latency", type=float, default=0.25, help="seconds the mock site waits per response (default: %(default)s)")
+    return parser
+
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging('scrape_cd.log')
+
+    if args.command == "browser-daemon":
+        return 0 if asyncio.run(run_browser_daemon()) else 1
+    elif args.command == "compare-html-backends":
+        return 0 if compare_html_backends(args.pages) else 1
+    elif args.command == "benchmark-html-backends":
+        benchmark_html_backends(args.pages)
+    elif args.command == "compare-normalizer":
+        return 0 if compare_text_normalizer(args.texts, args.fuzz, args.seed) else 1
+    elif args.command == "benchmark-normalizer":
+        benchmark_text_normalizer(args.texts)
+    elif args.command == "scrape" and args.dry_run:
+        dry_run()
+    elif args.command == "benchmark-shards":
+        try:
+            benchmark_scrape_shards(args.pages, [int(shards) for shards in args.shards.split(",")], args.latency)
+        except Exception as e:
+            logging.error(f"Shard benchmark failed: {e}")
+            print(f"Shard benchmark failed: {e}")
+            return 1
+    elif args.command == "scrape" and args.shards > 1:
+        sharded_scrape_stage(args.shards, args.budget * 60 if args.budget else None)
+    elif args.command == "scrape":
+        asyncio.run(scrape_stage(args.budget * 60 if args.budget else None))
+    elif args.command == "parse":
+        parse_stage(args.workers)
+    elif args.command == "write":
+        write_stage()
+    elif args.command == "enqueue":
+        work_queue = WorkQueue()
+        try:
+            enqueue_courses(work_queue)
+        finally:
+            work_queue.close()
+    elif args.command == "worker":
+        run_workers(args.processes)
+    elif args.command == "queue-status":
+        print_queue_status()
+    elif args.command == "export":
+        store = ScrapeStore()
+        try:
+            count = export_case_corpus(store, args.output, ("parquet", "jsonl") if args.format == "both" else (args.format,))
+        finally:
+            store.close()
+        print(f"Exported {count} cases to {args.output}")
+    else:
+        budget = getattr(args, "budget", None)
+        asyncio.run(main(budget * 60 if budget else None))
+    return 0
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    raise SystemExit(cli())
@@ -0,0 +1,2 @@
+# Code shared by the webscraper and RPA scripts: logging, the quota-aware Google Sheets client and the SQLite work queue.
+# The scripts put the repository root on sys.path and import these modules, so both always run the same copy.
@@ -0,0 +1,91 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+import collections
+import contextlib
+import multiprocessing
+
+
+# Configure logging: records are queued on the calling thread and written to the file by a listener thread
+LOG_PAYLOADS = os.environ.get("LOG_PAYLOADS", "0") == "1"  # log HTML / text payload snippets through payload_logger
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")  # "text" or "json"
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", 50))
+# Pass as extra= on hot-path log calls so only every LOG_SAMPLE_EVERY-th record from that call site is kept
+LOG_SAMPLED = {"sample": True}
+# Payload and snippet records go through their own logger, so LOG_PAYLOADS leaves library loggers at INFO
+payload_logger = logging.getLogger("payloads")
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, every)
+        self.counts = collections.Counter()
+
+    def filter(self, record):
+        if not getattr(record, "sample", False):
+            return True
+        # Count per call site, keeping the first record and every Nth after it
+        key = (record.pathname, record.lineno)
+        self.counts[key] += 1
+        record.sample_count = self.counts[key]
+        return (self.counts[key] - 1) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+            "line": record.lineno
+        }
+        if hasattr(record, "sample_count"):
+            entry["sample_count"] = record.sample_count
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def setup_logging(filename):
+    log_queue = queue.SimpleQueue()
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    # Sampling runs before enqueueing so dropped records cost nothing further
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_EVERY))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    payload_logger.setLevel(logging.DEBUG if LOG_PAYLOADS else logging.INFO)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    # Flush queued records on exit
+    atexit.register(listener.stop)
+    return listener
+
+@contextlib.contextmanager
+def forward_worker_logs():
+    # Pool processes log into a multiprocessing queue; a listener here hands their records to this process's handlers
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        yield log_queue
+    finally:
+        listener.stop()
+
+def log_to_queue(log_queue):
+    # Runs in the pool process: a forked child inherits the parent's QueueHandler but not its listener thread
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    payload_logger.setLevel(logging.DEBUG if LOG_PAYLOADS else logging.INFO)
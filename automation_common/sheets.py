@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+
+
+# Google Sheets API quotas: 60 read and 60 write requests / user / min, 300 of each / project / min
+SHEETS_USER_QUOTA_PER_MIN = 60
+SHEETS_PROJECT_QUOTA_PER_MIN = 300
+SHEETS_MAX_RETRIES = 5
+
+# The quota buckets live in one SQLite file, so both scripts and all their worker and shard processes on this host draw
+# from the same user and project budgets; by default it sits at the repository root, next to this package
+SHEETS_QUOTA_FILE = os.environ.get("SHEETS_QUOTA_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sheets-quota.sqlite3"))
+SHEETS_QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL,
+    updated REAL
+);
+"""
+
+# Parsed sheet rows are cached on disk and reused while the spreadsheet's Drive modified time is unchanged
+SHEET_CACHE = os.environ.get("SHEET_CACHE", "1") == "1"
+SHEET_CACHE_DIR = os.environ.get("SHEET_CACHE_DIR", ".sheet-cache")
+
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_quota(cls, requests_per_minute, *args, burst=10):
+        # Burst plus one minute of refill never exceeds the quota within any 60 second window
+        return cls(*args, burst, (requests_per_minute - burst) / 60)
+
+    def reserve(self):
+        # Take a token if one is available, otherwise return the seconds until one will be
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.refill_per_second
+
+    def acquire(self):
+        waited = 0
+        while (wait := self.reserve()) > 0:
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+    async def acquire_async(self):
+        waited = 0
+        while (wait := self.reserve()) > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+
+class SharedTokenBucket(TokenBucket):
+    # Same refill rule, with the bucket's state in a SQLite row every process on this host updates under one write lock
+    def __init__(self, path, name, capacity, refill_per_second):
+        super().__init__(capacity, refill_per_second)
+        self.path = path
+        self.name = name
+        # sqlite connections stay on the thread that opened them
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SHEETS_QUOTA_SCHEMA)
+            self.local.connection = connection
+        return connection
+
+    def reserve(self):
+        # Wall-clock time, since monotonic clocks are not comparable between processes
+        connection = self.connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.refill_per_second)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.refill_per_second
+            connection.execute("INSERT OR REPLACE INTO token_buckets VALUES (?, ?, ?)", (self.name, tokens, now))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class SheetsClient:
+    # One authorized client per credentials file, shared by every caller in the process
+    _shared_clients = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, credentials, quota_path=SHEETS_QUOTA_FILE):
+        self.credentials = credentials
+        self.client = self.authenticate()
+        # User quotas follow the service account and project quotas its Cloud project, wherever the key file is
+        with open(credentials, encoding="utf-8") as f:
+            account = json.load(f)
+        user = account.get("client_email", credentials)
+        project = account.get("project_id", credentials)
+        self.user_buckets = {kind: SharedTokenBucket.for_quota(SHEETS_USER_QUOTA_PER_MIN, quota_path, f"user:{user}:{kind}") for kind in ("read", "write")}
+        self.project_buckets = {kind: SharedTokenBucket.for_quota(SHEETS_PROJECT_QUOTA_PER_MIN, quota_path, f"project:{project}:{kind}") for kind in ("read", "write")}
+        self.metadata_cache = {}
+        self.metrics = {"requests": 0, "throttled_seconds": 0.0, "rate_limit_retries": 0}
+
+    @classmethod
+    def shared(cls, credentials):
+        with cls._shared_lock:
+            if credentials not in cls._shared_clients:
+                cls._shared_clients[credentials] = cls(credentials)
+            return cls._shared_clients[credentials]
+
+    def authenticate(self):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/drive']
+        creds = ServiceAccountCredentials.from_json_keyfile_name(self.credentials, scope)
+        logging.info(f"Authorized shared Google Sheets client for {self.credentials}")
+        return gspread.authorize(creds)
+
+    def backoff_delay(self, error, attempt):
+        # Only rate limit (429) errors are retried, with exponential backoff plus jitter
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+        if status_code != 429 or attempt >= SHEETS_MAX_RETRIES:
+            raise error
+        self.metrics["rate_limit_retries"] += 1
+        delay = min(64, 2 ** attempt) + random.random()
+        logging.warning(f"Google Sheets rate limit hit, retry {attempt + 1}/{SHEETS_MAX_RETRIES} in {delay:.1f}s")
+        return delay
+
+    def call(self, func, *args, kind="read", **kwargs):
+        import gspread
+        attempt = 0
+        while True:
+            self.metrics["throttled_seconds"] += self.user_buckets[kind].acquire() + self.project_buckets[kind].acquire()
+            self.metrics["requests"] += 1
+            try:
+                return func(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                time.sleep(self.backoff_delay(e, attempt))
+                attempt += 1
+
+    async def call_async(self, func, *args, kind="read", **kwargs):
+        # Same as call, but waits on the event loop and runs the blocking gspread request in a thread
+        import gspread
+        attempt = 0
+        while True:
+            self.metrics["throttled_seconds"] += await self.user_buckets[kind].acquire_async() + await self.project_buckets[kind].acquire_async()
+            self.metrics["requests"] += 1
+            try:
+                return await asyncio.to_thread(func, *args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                await asyncio.sleep(self.backoff_delay(e, attempt))
+                attempt += 1
+
+    def open_worksheet(self, spreadsheet_name, worksheet_name):
+        spreadsheet = self.call(self.client.open, spreadsheet_name)
+        return self.call(spreadsheet.worksheet, worksheet_name)
+
+    def read_cached_rows(self, worksheet, headers, fetch):
+        # One Drive metadata call decides whether the rows cached by the last run are still current
+        if not SHEET_CACHE:
+            return [list(row) for row in fetch()]
+        modified_time = self.call(worksheet.spreadsheet.get_lastUpdateTime)
+        # One file per column set, so readers of different columns on the same worksheet don't evict each other
+        headers_key = hashlib.sha1("\x1f".join(headers).encode("utf-8")).hexdigest()[:12]
+        path = os.path.join(SHEET_CACHE_DIR, f"{worksheet.spreadsheet.id}-{worksheet.id}-{headers_key}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            cached = None
+        if cached and cached["modified_time"] == modified_time and cached["headers"] == list(headers):
+            logging.info(f"Sheet {worksheet.title} unchanged since {modified_time}, loaded {len(cached['rows'])} rows from {path}")
+            return cached["rows"]
+
+        rows = [list(row) for row in fetch()]
+        # Write to a temporary file first so an interrupted run never leaves a half-written cache
+        os.makedirs(SHEET_CACHE_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"modified_time": modified_time, "headers": headers, "rows": rows}, f)
+        os.replace(f"{path}.tmp", path)
+        logging.info(f"Sheet {worksheet.title} modified at {modified_time}, fetched {len(rows)} rows and cached them in {path}")
+        return rows
+
+    def fetch_sheet_metadata(self, spreadsheet):
+        if spreadsheet.id not in self.metadata_cache:
+            self.metadata_cache[spreadsheet.id] = self.call(spreadsheet.fetch_sheet_metadata)
+        return self.metadata_cache[spreadsheet.id]
+
+    def invalidate_metadata(self, spreadsheet):
+        self.metadata_cache.pop(spreadsheet.id, None)
+
+    def get_column_count(self, worksheet):
+        # Look up the worksheet's own grid properties in the cached spreadsheet metadata
+        for sheet_properties in self.fetch_sheet_metadata(worksheet.spreadsheet)['sheets']:
+            if sheet_properties['properties']['sheetId'] == worksheet.id:
+                return sheet_properties['properties']['gridProperties']['columnCount']
+        raise ValueError(f"Worksheet {worksheet.title} not found in spreadsheet metadata")
+
+    def add_cols(self, worksheet, cols):
+        # Grid changes make the cached metadata stale
+        result = self.call(worksheet.add_cols, cols, kind="write")
+        self.invalidate_metadata(worksheet.spreadsheet)
+        return result
@@ -0,0 +1,124 @@
+import json
+import time
+import sqlite3
+from collections import namedtuple
+
+
+# Work queue: leased work items in SQLite so several worker processes on this host can share one plan;
+# SQLite's WAL locking does not work over a network filesystem, so every worker has to run on the same machine
+WORK_QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    queue TEXT,
+    item_key TEXT,
+    payload TEXT,
+    status TEXT DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (queue, item_key)
+);
+"""
+
+WorkItem = namedtuple("WorkItem", ["queue", "key", "payload", "attempts"])
+
+
+class WorkQueue:
+    def __init__(self, path, lease_seconds, max_attempts):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit, so lease() can take the write lock up front with BEGIN IMMEDIATE
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(WORK_QUEUE_SCHEMA)
+
+    def put(self, queue, key, payload=None):
+        # Enqueueing is idempotent: an item already queued, running or done is left alone
+        self.connection.execute(
+            "INSERT OR IGNORE INTO work_items (queue, item_key, payload, updated_at) VALUES (?, ?, ?, ?)",
+            (queue, key, json.dumps(payload), time.time())
+        )
+
+    def lease(self, queue, owner):
+        # Claim one pending item, or one whose lease expired because its worker died
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            # An item whose worker keeps dying mid-lease gives up like any other failure
+            self.connection.execute(
+                "UPDATE work_items SET status = 'failed', error = 'lease expired', updated_at = ? WHERE queue = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, queue, now, self.max_attempts)
+            )
+            row = self.connection.execute(
+                """SELECT item_key, payload, attempts FROM work_items
+                   WHERE queue = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                   ORDER BY updated_at LIMIT 1""",
+                (queue, now)
+            ).fetchone()
+            if row is None:
+                self.connection.execute("COMMIT")
+                return None
+            key, payload, attempts = row
+            self.connection.execute(
+                "UPDATE work_items SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = ?, updated_at = ? WHERE queue = ? AND item_key = ?",
+                (owner, now + self.lease_seconds, attempts + 1, now, queue, key)
+            )
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return WorkItem(queue, key, json.loads(payload), attempts + 1)
+
+    def heartbeat(self, item, owner):
+        # Extend the lease; False means it expired and another worker may have taken the item
+        cursor = self.connection.execute(
+            "UPDATE work_items SET lease_expires = ? WHERE queue = ? AND item_key = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + self.lease_seconds, item.queue, item.key, owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, item, owner):
+        self.connection.execute(
+            "UPDATE work_items SET status = 'done', lease_expires = NULL, error = NULL, updated_at = ? WHERE queue = ? AND item_key = ? AND lease_owner = ?",
+            (time.time(), item.queue, item.key, owner)
+        )
+
+    def fail(self, item, owner, error):
+        # Back to pending for another worker, until the item has used all its attempts
+        status = "failed" if item.attempts >= self.max_attempts else "pending"
+        self.connection.execute(
+            "UPDATE work_items SET status = ?, lease_expires = NULL, error = ?, updated_at = ? WHERE queue = ? AND item_key = ? AND lease_owner = ?",
+            (status, error, time.time(), item.queue, item.key, owner)
+        )
+
+    def update_payload(self, queue, key, payload):
+        # A re-enqueued item picks up the current payload unless a worker holds it right now
+        self.connection.execute(
+            "UPDATE work_items SET payload = ?, updated_at = ? WHERE queue = ? AND item_key = ? AND status != 'leased'",
+            (json.dumps(payload), time.time(), queue, key)
+        )
+
+    def requeue(self, queue, key):
+        self.connection.execute(
+            "UPDATE work_items SET status = 'pending', attempts = 0, lease_expires = NULL, updated_at = ? WHERE queue = ? AND item_key = ? AND status IN ('done', 'failed')",
+            (time.time(), queue, key)
+        )
+
+    def status(self, queue, key):
+        row = self.connection.execute("SELECT status FROM work_items WHERE queue = ? AND item_key = ?", (queue, key)).fetchone()
+        return row[0] if row else None
+
+    def outstanding(self, queues):
+        # Items still pending or leased; workers stop once this reaches zero
+        placeholders = ", ".join("?" for _ in queues)
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM work_items WHERE queue IN ({placeholders}) AND status IN ('pending', 'leased')", tuple(queues)
+        ).fetchone()[0]
+
+    def counts(self):
+        return self.connection.execute("SELECT queue, status, COUNT(*) FROM work_items GROUP BY queue, status ORDER BY queue, status").fetchall()
+
+    def close(self):
+        self.connection.close()